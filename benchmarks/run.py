@@ -0,0 +1,268 @@
+"""
+Offline performance benchmarks for the dashboard's I/O paths.
+
+Every external service is replaced by a local stub from
+:mod:`benchmarks.stubs`, so this runs anywhere without credentials::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 1,8,32 --only mqtt,camera --json results.json
+
+Scenarios:
+
+- ``mqtt``: QoS 1 publish throughput and PUBACK latency.
+- ``command``: command round trip to a simulated mp3player that answers
+  with a status message.
+- ``ubidots``: upload batching (writes per POST) under bursts of writes.
+- ``camera``: ``/capture`` fetch latency through the pooled camera client.
+- ``stream``: N Live Cam viewers sharing one ``get_stream()`` reader;
+  frames per second each viewer sees and the age of a frame when it
+  reaches the viewer.
+- ``analysis``: end-to-end scheduler sweep against a mock streaming
+  vision API.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+import numpy as np
+import paho.mqtt.client as paho
+from benchmarks.stubs import FakeCamera, MiniBroker, MockOpenAI, UbidotsStub
+
+logger = logging.getLogger("benchmarks")
+
+SCENARIOS = ("mqtt", "command", "ubidots", "camera", "stream", "analysis")
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None}
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return {"p50_ms": round(float(p50), 2), "p99_ms": round(float(p99), 2)}
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def connected_client(broker):
+    from nodes.mqtt_client import MyMQTTClient
+    client = MyMQTTClient("127.0.0.1", broker.port, None, None, tls=False)
+    client.acquire()
+    deadline = time.monotonic() + 10
+    while not client.is_connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if not client.is_connected:
+        raise RuntimeError("benchmark MQTT client could not connect to the local broker")
+    return client
+
+
+def bench_mqtt(broker, concurrency, messages):
+    client = connected_client(broker)
+    per_thread = max(1, messages // concurrency)
+    handles = []
+    lock = threading.Lock()
+    payload = b'{"value":17}'
+
+    def publisher(i):
+        mine = [client.publish_async(f"bench/{i}/volume", payload, qos=1) for _ in range(per_thread)]
+        for handle in mine:
+            handle.wait(10)
+        with lock:
+            handles.extend(mine)
+
+    elapsed = run_threads(concurrency, publisher)
+    client.release()
+    acked = [h for h in handles if h.acked]
+    return {"messages": len(handles), "acked": len(acked),
+            "msgs_per_s": round(len(acked) / elapsed, 1),
+            **percentiles([h.latency for h in acked])}
+
+
+class _Device:
+    """Simulated mp3player: answers every control/setting command with a status message."""
+    def __init__(self, broker):
+        self.client = paho.Client(paho.CallbackAPIVersion.VERSION2, client_id=f"bench-device-{uuid.uuid4().hex[:8]}")
+        self.client.on_message = self._on_message
+        self.client.connect("127.0.0.1", broker.port)
+        self.client.subscribe([("control/#", 0), ("setting/#", 0)])
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        _, field, device = msg.topic.split("/")[:3]
+        client.publish(f"status/{field}/{device}", msg.payload)
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def bench_command(broker, concurrency, messages):
+    from nodes.telemetry import TelemetryStore
+    device = _Device(broker)
+    client = connected_client(broker)
+    store = TelemetryStore()
+    events = {f"bench{i}": threading.Event() for i in range(concurrency)}
+    store.add_listener(lambda kind, field, dev, data, ts: kind == "status" and field in events and events[field].set())
+    client.subscribe_telemetry(store)
+    time.sleep(0.2)
+    per_field = max(1, messages // concurrency)
+    rtts, lost = [], []
+
+    def commander(i):
+        field = f"bench{i}"
+        for n in range(per_field):
+            events[field].clear()
+            started = time.perf_counter()
+            client.send_command("set_volume", field, value=n % 31)
+            if events[field].wait(5):
+                rtts.append(time.perf_counter() - started)
+            else:
+                lost.append(field)
+
+    elapsed = run_threads(concurrency, commander)
+    client.release()
+    device.stop()
+    return {"commands": len(rtts) + len(lost), "lost": len(lost),
+            "cmds_per_s": round(len(rtts) / elapsed, 1), **percentiles(rtts)}
+
+
+def bench_ubidots(stub, concurrency, messages):
+    from nodes.ubidots_client import ubidots
+    client = ubidots("bench", "bench", base_url=stub.base_url, flush_interval=0.2)
+    posts_before, dots_before = stub.posts, stub.dots
+    per_thread = max(1, messages // concurrency)
+
+    def writer(i):
+        for n in range(per_thread):
+            client.send_data_async({f"var{i % 4}": n, "speaker_volume": n % 31})
+            time.sleep(0.001)
+
+    started = time.perf_counter()
+    run_threads(concurrency, writer)
+    client.flush(30)
+    elapsed = time.perf_counter() - started
+    writes = per_thread * concurrency * 2
+    posts = stub.posts - posts_before
+    return {"writes": writes, "posts": posts, "dots": stub.dots - dots_before,
+            "writes_per_post": round(writes / max(posts, 1), 1),
+            "delivered_s": round(elapsed, 2)}
+
+
+def bench_camera(cameras, concurrency, messages):
+    from nodes.camera import get_camera
+    per_camera = max(1, messages // concurrency)
+    latencies, errors = [], []
+
+    def fetcher(i):
+        client = get_camera(cameras[i].host)
+        for _ in range(per_camera):
+            started = time.perf_counter()
+            try:
+                client.fetch_jpeg(deadline=10)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+
+    elapsed = run_threads(concurrency, fetcher)
+    return {"fetches": len(latencies), "errors": len(errors),
+            "frames_per_s": round(len(latencies) / elapsed, 1), **percentiles(latencies)}
+
+
+def bench_stream(camera, concurrency, messages):
+    from nodes.mjpeg import get_stream
+    reader = get_stream(camera.host)
+    per_viewer = max(1, messages // 10)
+    requests_before = camera.requests
+    ages, skipped, errors = [], [], []
+
+    def viewer(i):
+        seq = 0
+        with reader:
+            for _ in range(per_viewer):
+                latest_seq, frame, frame_ts = reader.wait_frame(seq, timeout=5.0)
+                if latest_seq <= seq:
+                    errors.append(reader.error or "no frame")
+                    return
+                ages.append(time.time() - frame_ts)
+                if seq:
+                    skipped.append(latest_seq - seq - 1)
+                seq = latest_seq
+
+    elapsed = run_threads(concurrency, viewer)
+    return {"frames": len(ages), "errors": len(errors),
+            "frames_per_s": round(len(ages) / elapsed / concurrency, 1),
+            "skipped": int(sum(skipped)), "streams_opened": camera.requests - requests_before,
+            **{key.replace("_ms", "_age_ms"): value for key, value in percentiles(ages).items()}}
+
+
+def bench_analysis(cameras, mock, concurrency, messages):
+    from nodes.LLM_nodes import RicePlantAnalyzer
+    from nodes.scheduler import AnalysisScheduler
+    analyzer = RicePlantAnalyzer(api_key="bench", base_url=mock.base_url)
+    scheduler = AnalysisScheduler(analyzer, fetch_workers=concurrency,
+                                  vision_concurrency=concurrency, vision_rate=1000)
+    hosts = [camera.host for camera in cameras[:concurrency]]
+    started = time.perf_counter()
+    scheduler.sweep(hosts)
+    while any(scheduler.store.get(h).finished is None for h in hosts):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    results = [scheduler.store.get(h) for h in hosts]
+    return {"cameras": len(hosts), "ok": sum(r.status == "ok" for r in results),
+            "sweep_s": round(elapsed, 2), **percentiles([r.duration for r in results])}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--messages", type=int, default=400,
+                        help="operations per scenario and level (split across workers)")
+    parser.add_argument("--only", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(),
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    selected = [s for s in args.only.split(",") if s]
+    broker = MiniBroker().start()
+    stub = UbidotsStub()
+    cameras = [FakeCamera() for _ in range(max(levels))]
+    mock = MockOpenAI()
+    runners = {
+        "mqtt": lambda c: bench_mqtt(broker, c, args.messages),
+        "command": lambda c: bench_command(broker, c, args.messages),
+        "ubidots": lambda c: bench_ubidots(stub, c, args.messages),
+        "camera": lambda c: bench_camera(cameras, c, args.messages),
+        # Semua penonton berbagi satu stream dari kamera pertama
+        "stream": lambda c: bench_stream(cameras[0], c, args.messages),
+        # Analisis lebih berat; jumlah kamera = tingkat konkurensi
+        "analysis": lambda c: bench_analysis(cameras, mock, c, args.messages),
+    }
+
+    results = []
+    for scenario in selected:
+        for level in levels:
+            row = {"scenario": scenario, "concurrency": level, **runners[scenario](level)}
+            results.append(row)
+            print("  ".join(f"{k}={v}" for k, v in row.items()), flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    broker.stop()
+    return results
+
+
+if __name__ == "__main__":
+    main()
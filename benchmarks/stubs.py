@@ -0,0 +1,333 @@
+"""
+Local stand-ins for every external service the dashboard talks to.
+
+Each stub runs on a daemon thread bound to 127.0.0.1 on a free port, so
+benchmarks need no network access, credentials or hardware.
+"""
+import asyncio
+import json
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from PIL import Image
+
+# ------------------------------------------------------------------ MQTT
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte, value = value % 128, value // 128
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def _string(text):
+    data = text.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def _topic_matches(pattern, topic):
+    pattern_parts, topic_parts = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class _Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.v5 = False
+        self.filters = []
+
+
+class MiniBroker:
+    """
+    Minimal MQTT 3.1.1/5 broker: CONNECT, PUBLISH with QoS 0/1 acks,
+    SUBSCRIBE with wildcards, PING and DISCONNECT. Messages are routed to
+    subscribers at QoS 0. No auth, retain, will or persistence.
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.sessions = set()
+        self.received = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mini-broker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    async def _shutdown(self):
+        self._server.close()
+        for session in list(self.sessions):
+            session.writer.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._serve, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _read_packet(self, reader):
+        header = await reader.readexactly(1)
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return header[0], await reader.readexactly(length)
+
+    @staticmethod
+    def _skip_properties(body, pos):
+        length, shift = 0, 0
+        while True:
+            byte = body[pos]
+            pos += 1
+            length += (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return pos + length
+
+    async def _serve(self, reader, writer):
+        session = _Session(writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                first, body = await self._read_packet(reader)
+                kind = first >> 4
+                if kind == CONNECT:
+                    name_len = struct.unpack("!H", body[:2])[0]
+                    session.v5 = body[2 + name_len] == 5
+                    ack = b"\x00\x00\x00" if session.v5 else b"\x00\x00"
+                    writer.write(bytes([CONNACK << 4]) + _varint(len(ack)) + ack)
+                elif kind == PUBLISH:
+                    self._on_publish(session, first, body)
+                elif kind == SUBSCRIBE:
+                    packet_id = body[:2]
+                    pos = self._skip_properties(body, 2) if session.v5 else 2
+                    granted = bytearray()
+                    while pos < len(body):
+                        length = struct.unpack("!H", body[pos:pos + 2])[0]
+                        session.filters.append(body[pos + 2:pos + 2 + length].decode())
+                        pos += 3 + length
+                        granted.append(0)
+                    payload = packet_id + (b"\x00" if session.v5 else b"") + bytes(granted)
+                    writer.write(bytes([SUBACK << 4]) + _varint(len(payload)) + payload)
+                elif kind == PINGREQ:
+                    writer.write(bytes([PINGRESP << 4, 0]))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+
+    def _on_publish(self, session, first, body):
+        qos = (first >> 1) & 3
+        length = struct.unpack("!H", body[:2])[0]
+        topic = body[2:2 + length].decode()
+        pos = 2 + length
+        if qos:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+            session.writer.write(bytes([PUBACK << 4, 2]) + packet_id)
+        if session.v5:
+            pos = self._skip_properties(body, pos)
+        payload = body[pos:]
+        self.received += 1
+        for other in list(self.sessions):
+            if any(_topic_matches(f, topic) for f in other.filters):
+                packet = _string(topic) + (b"\x00" if other.v5 else b"") + payload
+                other.writer.write(bytes([PUBLISH << 4]) + _varint(len(packet)) + packet)
+
+
+# ------------------------------------------------------------------ HTTP
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Klien benchmark menutup koneksi sesukanya; itu bukan error stub
+        if not isinstance(sys.exc_info()[1], (ConnectionError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def _serve_http(handler):
+    server = _StubServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name=handler.__name__, daemon=True).start()
+    return server
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body, content_type="application/json", status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UbidotsStub:
+    """Accepts device POSTs like the Ubidots API and counts requests and dots."""
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.posts = 0
+        self.dots = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(_Handler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.posts += 1
+                    stub.dots += sum(len(v) if isinstance(v, list) else 1 for v in body.values())
+                self._reply(b"{}")
+
+        self.server = _serve_http(Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+
+def make_jpeg(width=800, height=600, seed=0):
+    """A noisy JPEG of realistic size for an ESP32 frame."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize((width, height), Image.BILINEAR)
+    buf = BytesIO()
+    image.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+class FakeCamera:
+    """
+    ESP32 CameraWebServer stand-in: ``/capture``, ``/status``, ``/control``,
+    ``/xclk`` and an MJPEG ``/stream`` on the same port.
+    """
+    BOUNDARY = "123456789000000000000987654321"
+
+    def __init__(self, capture_delay=0.05, fps=20, jpeg=None):
+        self.capture_delay = capture_delay
+        self.fps = fps
+        self.jpeg = jpeg or make_jpeg()
+        self.status = {"framesize": 8, "quality": 10, "xclk": 20, "brightness": 0}
+        self.requests = 0
+        camera = self
+
+        class Handler(_Handler):
+            def do_GET(self):
+                camera.requests += 1
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/capture":
+                    time.sleep(camera.capture_delay)
+                    self._reply(camera.jpeg, "image/jpeg")
+                elif url.path == "/status":
+                    self._reply(json.dumps(camera.status).encode())
+                elif url.path == "/control":
+                    camera.status[query["var"]] = int(query["val"])
+                    self._reply(b"")
+                elif url.path == "/xclk":
+                    camera.status["xclk"] = int(query["xclk"])
+                    self._reply(b"")
+                elif url.path == "/stream":
+                    self._stream()
+                else:
+                    self._reply(b"", status=404)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 f"multipart/x-mixed-replace;boundary={camera.BOUNDARY}")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    while True:
+                        part = (f"\r\n--{camera.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                f"Content-Length: {len(camera.jpeg)}\r\n\r\n").encode() + camera.jpeg
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+                        self.wfile.flush()
+                        time.sleep(1 / camera.fps)
+                except OSError:
+                    pass
+
+        self.server = _serve_http(Handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+
+
+class MockOpenAI:
+    """
+    OpenAI-compatible ``/v1/chat/completions`` that streams ``tokens`` SSE
+    chunks after ``first_token`` seconds, ``token_interval`` apart.
+    """
+    def __init__(self, tokens=200, first_token=0.3, token_interval=0.005):
+        self.tokens = tokens
+        self.first_token = first_token
+        self.token_interval = token_interval
+        self.requests = 0
+        self.bytes_received = 0
+        mock = self
+
+        class Handler(_Handler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                mock.requests += 1
+                mock.bytes_received += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(mock.first_token)
+                for i in range(mock.tokens):
+                    chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0,
+                             "model": "bench", "choices": [{"index": 0, "delta": {"content": f"tok{i} "},
+                                                            "finish_reason": None}]}
+                    self._chunk(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+                    time.sleep(mock.token_interval)
+                self._chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        self.server = _serve_http(Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
@@ -1,5 +1,4 @@
 import numpy as np
-import requests
 from io import BytesIO
 from PIL import Image
 import logging
@@ -7,65 +6,217 @@ from typing import Iterator
 import uuid
 import os
 import base64
+import hashlib
+import importlib.util
+import time
+import httpx
 from openai import OpenAI
 from streamlit import secrets
+from nodes.analysis_cache import dhash
+from nodes.camera import get_camera
+from nodes.metrics import registry
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Sisi terpanjang gambar yang dikirim ke model vision dan kualitas JPEG hasil re-encode
+DEFAULT_MAX_SIDE = 1024
+DEFAULT_JPEG_QUALITY = 85
+MODEL = "grok-2-vision-latest"
+API_BASE_URL = "https://api.x.ai/v1"
+MAX_TOKENS = 500
+# Timeout koneksi dan jeda maksimum antar potongan stream dari API vision (detik)
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+# Koneksi keep-alive ke API dipakai ulang oleh semua permintaan dalam proses
+MAX_CONNECTIONS = 8
+KEEPALIVE_EXPIRY = 120
+# HTTP/2 hanya bila paket h2 terpasang (httpx[http2]); selain itu HTTP/1.1 keep-alive
+HTTP2 = importlib.util.find_spec("h2") is not None
+ANALYSIS_PROMPT = """
+You are an expert agronomist analyzing a top-down image of a rice plant. Based on that image, provide a detailed description of the rice plant's condition. Include observations about its appearance, such as leaf color, structure, and any visible signs of stress or abnormalities. Discuss possible causes of the observed condition and recommend actions to improve or maintain the plant's health. Format your response in markdown for clarity, ensuring it is comprehensive and suitable for farmers or agricultural experts. Answer with objectivity and precision, avoiding any subjective language or personal opinions. Your response should be informative and actionable, providing clear guidance on how to address the plant's condition. Use bullet points or numbered lists where appropriate to enhance readability. answer with short and clear sentences.
+"""
+# Ikut berubah bila prompt diubah, sehingga cache analisis lama tidak terpakai
+PROMPT_VERSION = hashlib.sha1(ANALYSIS_PROMPT.encode()).hexdigest()[:12]
+
+
+def make_http_client(connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                     read_timeout: float = DEFAULT_READ_TIMEOUT) -> httpx.Client:
+    """Pooled keep-alive HTTP client for the vision API, HTTP/2 when available."""
+    return httpx.Client(
+        http2=HTTP2,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                            max_keepalive_connections=MAX_CONNECTIONS,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+    )
+
+
+class StreamStats:
+    """Timing of one streamed vision request."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_token = None
+        self.finished = None
+        self.tokens = 0
+        self.bytes_uploaded = 0
+        self.http_version = None
+        self.cached = False
+
+    @property
+    def ttft(self):
+        """Seconds from sending the request to the first streamed token."""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def latency(self):
+        return None if self.finished is None else self.finished - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token is None or self.finished is None or self.tokens < 2:
+            return None
+        elapsed = self.finished - self.first_token
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def as_dict(self):
+        return {
+            "ttft_s": self.ttft,
+            "tokens": self.tokens,
+            "tokens_per_s": self.tokens_per_second,
+            "latency_s": self.latency,
+            "bytes_uploaded": self.bytes_uploaded,
+            "http_version": self.http_version,
+            "cached": self.cached,
+        }
+
+
 class RicePlantAnalyzer:
-    """Class to analyze rice plant conditions using ESP32 camera images and xAI Grok-2 Vision API."""
-    def __init__(self, max_retries: int = 3, timeout: int = 10):
+    """
+    Class to analyze rice plant conditions using ESP32 camera images and xAI Grok-2 Vision API.
+
+    One instance is meant to be shared by the whole process: it owns a
+    pooled keep-alive HTTP client, so repeated analyses skip the TCP/TLS
+    handshake. Every streamed request records time to first token, tokens
+    per second, total latency and uploaded bytes in
+    :data:`nodes.metrics.registry`.
+    """
+    def __init__(self, max_retries: int = 3, timeout: int = 10,
+                 max_side: int = DEFAULT_MAX_SIDE, jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                 image_detail: str = "high", cache=None, api_key: str = None,
+                 base_url: str = API_BASE_URL, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, max_tokens: int = MAX_TOKENS):
         self.max_retries = max_retries
         self.timeout = timeout
-        self.api_key = secrets.get("XAI_API_KEY")
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.image_detail = image_detail
+        self.max_tokens = max_tokens
+        # AnalysisCache opsional; hasil analisis untuk frame yang (hampir) sama diputar ulang
+        self.cache = cache
+        self.api_key = api_key or secrets.get("XAI_API_KEY")
         if not self.api_key:
             raise ValueError("XAI_API_KEY environment variable not set.")
+        self.http_client = make_http_client(connect_timeout, read_timeout)
         self.client = OpenAI(
             api_key=self.api_key,
-            base_url="https://api.x.ai/v1"
+            base_url=base_url,
+            http_client=self.http_client
         )
         self.session_id = str(uuid.uuid4())
-        logger.info(f"Initialized RicePlantAnalyzer with session ID: {self.session_id}")
+        logger.info("Initialized RicePlantAnalyzer with session ID: %s", self.session_id)
 
-    def _fetch_image(self, camera_ip: str) -> np.ndarray:
-        """Fetch image from ESP32 camera web server."""
+    def _fetch_jpeg(self, camera_ip: str, deadline: float = None) -> bytes:
+        """Fetch the raw JPEG bytes from the ESP32 camera web server."""
         if not camera_ip:
             raise ValueError("Camera IP must be provided.")
-        url = f"http://{camera_ip}/capture"
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.get(url, timeout=self.timeout)
-                response.raise_for_status()
-                image = Image.open(BytesIO(response.content))
-                image = np.array(image)
-                if len(image.shape) == 2:  # Convert grayscale to RGB
-                    image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-                logger.info("Image fetched successfully.")
-                return image
-            except requests.RequestException as e:
-                logger.warning(f"Attempt {attempt + 1} failed to fetch image: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    raise RuntimeError(f"Failed to fetch image after {self.max_retries} attempts.")
-
-    def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
-        try:
-            image = image / 255.0
-            # Ensure correct format (H, W, C)
-            if image.shape[-1] != 3:
-                image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-            logger.info("Image preprocessed successfully.")
-            return image
-        except Exception as e:
-            logger.error(f"Image preprocessing failed: {str(e)}")
-            raise
+        jpeg = get_camera(camera_ip).fetch_jpeg(deadline=deadline or self.timeout)
+        logger.info("Image fetched successfully.")
+        return jpeg
+
+    def capture(self, camera_ip: str, deadline: float = None) -> bytes:
+        """Capture a JPEG frame from the camera, for analysing later with ``image=``."""
+        return self._fetch_jpeg(camera_ip, deadline)
+
+    def _to_jpeg(self, image) -> bytes:
+        """Accept JPEG bytes, a PIL image or an array and return JPEG bytes."""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return bytes(image)
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        buf = BytesIO()
+        image.convert("RGB").save(buf, format="JPEG", quality=self.jpeg_quality)
+        return buf.getvalue()
+
+    def _encode_image(self, jpeg: bytes) -> str:
+        """
+        Base64 the image for the vision API, downscaled to ``max_side``.
+
+        Only the header is parsed to read the size; a JPEG that already
+        fits is passed through byte-for-byte. Larger frames are decoded
+        once with libjpeg's DCT scaling (``draft``), resized and
+        re-encoded at ``jpeg_quality``.
+        """
+        with Image.open(BytesIO(jpeg)) as image:
+            if image.format == "JPEG" and max(image.size) <= self.max_side:
+                logger.info("Image %sx%s fits, sending original JPEG (%d bytes).",
+                            image.size[0], image.size[1], len(jpeg))
+                return base64.b64encode(jpeg).decode("ascii")
+            image.draft("RGB", (self.max_side, self.max_side))
+            image = image.convert("RGB")
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            buf = BytesIO()
+            image.save(buf, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        encoded = buf.getvalue()
+        logger.info("Image resized to %sx%s, %d -> %d bytes.",
+                    image.size[0], image.size[1], len(jpeg), len(encoded))
+        return base64.b64encode(encoded).decode("ascii")
 
-    def infer_plant_condition(self, camera_ip: str) -> Iterator[str]:
+    def _cache_context(self) -> str:
+        return f"{MODEL}:{PROMPT_VERSION}:{self.max_side}:{self.image_detail}"
+
+    def close(self):
+        """Close the pooled HTTP connections."""
+        self.http_client.close()
+
+    def _record(self, stats: StreamStats, status: str):
+        registry.counter("vision_requests_total", model=MODEL, status=status).inc()
+        if stats.ttft is not None:
+            registry.histogram("vision_ttft_seconds", model=MODEL).observe(stats.ttft)
+        if stats.tokens_per_second is not None:
+            registry.histogram("vision_tokens_per_second", model=MODEL).observe(stats.tokens_per_second)
+        if stats.latency is not None and status == "ok":
+            registry.histogram("vision_latency_seconds", model=MODEL).observe(stats.latency)
+        registry.histogram("vision_upload_bytes", model=MODEL).observe(stats.bytes_uploaded)
+        logger.info("Vision request %s: ttft=%s tokens=%d latency=%s upload=%d bytes (%s)",
+                    status, stats.ttft, stats.tokens, stats.latency,
+                    stats.bytes_uploaded, stats.http_version)
+
+    def infer_plant_condition(self, camera_ip: str = None, image=None,
+                              stats: StreamStats = None, timeout: float = None) -> Iterator[str]:
+        """
+        Stream a markdown analysis of the plant.
+
+        Uses ``image`` (JPEG bytes, PIL image or array) when given, otherwise
+        captures a frame from ``camera_ip``. Pass a :class:`StreamStats` as
+        ``stats`` to read the timing of this request afterwards. ``timeout``
+        caps the connect and every read of the API request at that many
+        seconds, without retries, instead of the client-wide read timeout.
+        """
+        if stats is None:
+            stats = StreamStats()
         try:
-            image = self._fetch_image(camera_ip)
-            processed_image = self._preprocess_image(image)
-            image_base64 = ""
+            jpeg = self._to_jpeg(image) if image is not None else self._fetch_jpeg(camera_ip)
+            if self.cache is not None:
+                phash = dhash(jpeg)
+                context = self._cache_context()
+                cached = self.cache.lookup(phash, context)
+                if cached is not None:
+                    logger.info("Analysis cache hit for frame %016x.", phash)
+                    stats.cached = True
+                    yield from cached
+                    return
+            image_base64 = self._encode_image(jpeg)
             messages = [
                 {
                     "role": "user",
@@ -74,39 +225,61 @@ class RicePlantAnalyzer:
                             "type": "image_url",
                             "image_url": {
                                 "url": f"data:image/jpeg;base64,{image_base64}",
-                                "detail": "high"
+                                "detail": self.image_detail
                             }
                         },
                         {
                             "type": "text",
-                            "text": """
-You are an expert agronomist analyzing a top-down image of a rice plant. Based on that image, provide a detailed description of the rice plant's condition. Include observations about its appearance, such as leaf color, structure, and any visible signs of stress or abnormalities. Discuss possible causes of the observed condition and recommend actions to improve or maintain the plant's health. Format your response in markdown for clarity, ensuring it is comprehensive and suitable for farmers or agricultural experts. Answer with objectivity and precision, avoiding any subjective language or personal opinions. Your response should be informative and actionable, providing clear guidance on how to address the plant's condition. Use bullet points or numbered lists where appropriate to enhance readability. answer with short and clear sentences.
-"""
+                            "text": ANALYSIS_PROMPT
                         }
                     ]
                 }
             ]
 
+            # Waktu diukur dari saat permintaan dikirim, bukan dari pengambilan gambar
+            stats.started = time.monotonic()
+            status = "error"
+            # Batas waktu per permintaan; retry dimatikan agar tidak melewati batas itu
+            client = self.client if timeout is None else \
+                self.client.with_options(timeout=timeout, max_retries=0)
             try:
-                stream = self.client.chat.completions.create(
-                    model="grok-2-vision-latest",
+                raw = client.chat.completions.with_raw_response.create(
+                    model=MODEL,
                     messages=messages,
                     temperature=0.7,
-                    max_tokens=500,
+                    max_tokens=self.max_tokens,
                     stream=True
                 )
+                stats.bytes_uploaded = len(raw.http_request.content)
+                stats.http_version = raw.http_version
 
-                for chunk in stream:
+                chunks = []
+                for chunk in raw.parse():
                     if chunk.choices and chunk.choices[0].delta.content:
                         content = chunk.choices[0].delta.content
+                        if stats.first_token is None:
+                            stats.first_token = time.monotonic()
+                        # API mengirim kira-kira satu token per potongan
+                        stats.tokens += 1
+                        chunks.append(content)
                         yield content
                         logger.debug("Streamed chunk of analysis.")
 
+                status = "ok"
                 logger.info("Plant condition analysis completed.")
+                if self.cache is not None and chunks:
+                    self.cache.store(phash, context, chunks)
+            except GeneratorExit:
+                # Pemanggil berhenti membaca stream di tengah jalan
+                status = "abandoned"
+                raise
             except Exception as e:
-                logger.error(f"API request failed: {str(e)}")
+                logger.error("API request failed: %s", e)
                 raise RuntimeError(f"Failed to get response from Grok-2 Vision API: {str(e)}")
+            finally:
+                stats.finished = time.monotonic()
+                self._record(stats, status)
 
         except Exception as e:
-            logger.error(f"Error during inference: {str(e)}")
+            logger.error("Error during inference: %s", e)
             raise
\ No newline at end of file
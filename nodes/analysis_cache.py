@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 6 * 3600
+# Jarak Hamming maksimum (dari 64 bit) agar dua frame dianggap sama
+DEFAULT_MAX_DISTANCE = 4
+
+
+def dhash(jpeg: bytes, size: int = 8) -> int:
+    """
+    64-bit difference hash of an image.
+
+    The JPEG is decoded at reduced scale (``draft``), shrunk to
+    ``(size + 1) x size`` grayscale, and each bit records whether a pixel
+    is brighter than its right-hand neighbour. Small changes in noise,
+    exposure or compression flip few bits.
+    """
+    with Image.open(BytesIO(jpeg)) as image:
+        image.draft("L", (size * 8, size * 8))
+        small = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of finished vision analyses, persisted as JSON.
+
+    Entries are keyed by the perceptual hash of the frame and a context
+    string (model, prompt version, image settings). With ``max_distance``
+    above zero, a frame whose hash is within that many bits of a cached one
+    counts as the same view, so a static field is analysed once.
+    """
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 max_distance=DEFAULT_MAX_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def _key(phash, context):
+        return f"{context}:{phash:016x}"
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable analysis cache %s: %s", self.path, e)
+            return
+        now = time.time()
+        for entry in entries:
+            if now - entry["created"] < self.ttl:
+                self._entries[self._key(entry["hash"], entry["context"])] = entry
+        logger.info("Loaded %d cached analyses.", len(self._entries))
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self._entries.values()), f)
+        os.replace(tmp, self.path)
+
+    def lookup(self, phash, context):
+        """Return the cached chunks for a matching frame, or None."""
+        now = time.time()
+        with self._lock:
+            key = self._key(phash, context)
+            entry = self._entries.get(key)
+            if entry is None and self.max_distance > 0:
+                best = self.max_distance + 1
+                for candidate_key, candidate in self._entries.items():
+                    if candidate["context"] != context:
+                        continue
+                    distance = bin(candidate["hash"] ^ phash).count("1")
+                    if distance < best:
+                        best, key, entry = distance, candidate_key, candidate
+            if entry is not None and now - entry["created"] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry["chunks"])
+
+    def store(self, phash, context, chunks):
+        with self._lock:
+            key = self._key(phash, context)
+            self._entries[key] = {"hash": phash, "context": context,
+                                  "chunks": list(chunks), "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                logger.error("Failed to persist analysis cache: %s", e)
@@ -0,0 +1,225 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from nodes.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Batas total satu pengambilan gambar (semua percobaan), bukan per percobaan
+DEFAULT_DEADLINE = 10.0
+CONNECT_TIMEOUT = 2.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.25
+# Frame ESP32 jarang lebih dari ~200 KB; tolak respons yang jauh lebih besar
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+# Status kamera dianggap masih berlaku selama ini saat menghitung perubahan setting
+STATUS_TTL = 60.0
+FLEET_WORKERS = 16
+# Urutan framesize_t di driver esp32-camera; indeks = nilai "framesize"
+FRAMESIZES = ("96x96", "QQVGA(160x120)", "128x128", "QCIF(176x144)", "HQVGA(240x176)",
+              "240x240", "QVGA(320x240)", "CIF(400x296)", "HVGA(480x320)", "VGA(640x480)",
+              "SVGA(800x600)", "XGA(1024x768)", "HD(1280x720)", "SXGA(1280x1024)",
+              "UXGA(1600x1200)")
+
+
+class CameraError(RuntimeError):
+    """Raised when a camera cannot deliver a frame before its deadline."""
+
+
+class CameraClient:
+    """
+    HTTP client for one ESP32-CAM.
+
+    Holds a keep-alive session with a single pooled connection, since the
+    ESP32 web server handles one request at a time anyway. Every call is
+    bounded by an overall deadline shared by all attempts; retries back off
+    with jitter, and bodies are read in chunks up to ``max_bytes``.
+    """
+    def __init__(self, host, deadline=DEFAULT_DEADLINE, max_attempts=MAX_ATTEMPTS,
+                 max_bytes=MAX_FRAME_BYTES):
+        self.host = host
+        self.base_url = f"http://{host}"
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        # ESP32 hanya melayani satu request; serialisasi akses per kamera
+        self._lock = threading.Lock()
+        self._status = None
+        self._status_at = 0.0
+
+    def _timeout(self, deadline_at):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise CameraError(f"{self.host}: deadline exceeded")
+        return (min(CONNECT_TIMEOUT, remaining), remaining)
+
+    def _read_capped(self, response, deadline_at):
+        length = response.headers.get("Content-Length")
+        if length and int(length) > self.max_bytes:
+            raise CameraError(f"{self.host}: frame of {length} bytes exceeds {self.max_bytes}")
+        buf = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            buf += chunk
+            if len(buf) > self.max_bytes:
+                raise CameraError(f"{self.host}: frame exceeds {self.max_bytes} bytes")
+            if time.monotonic() > deadline_at:
+                raise CameraError(f"{self.host}: deadline exceeded while reading")
+        return bytes(buf)
+
+    def get(self, path, params=None, deadline=None):
+        """GET ``path`` with retries inside one deadline; returns the body bytes."""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        url = self.base_url + path
+        last_error = None
+        with self._lock:
+            for attempt in range(self.max_attempts):
+                try:
+                    with self.session.get(url, params=params, stream=True,
+                                          timeout=self._timeout(deadline_at)) as response:
+                        response.raise_for_status()
+                        return self._read_capped(response, deadline_at)
+                except requests.RequestException as e:
+                    last_error = e
+                    logger.warning("Attempt %d on %s failed: %s", attempt + 1, url, e)
+                if attempt + 1 < self.max_attempts:
+                    delay = random.uniform(0, BACKOFF_BASE * 2 ** attempt)
+                    if time.monotonic() + delay >= deadline_at:
+                        break
+                    time.sleep(delay)
+        raise CameraError(f"{self.host}: {path} failed: {last_error}")
+
+    def fetch_jpeg(self, deadline=None):
+        started = time.perf_counter()
+        try:
+            jpeg = self.get("/capture", deadline=deadline)
+        except CameraError:
+            registry.counter("camera_fetch_errors_total", camera=self.host).inc()
+            raise
+        registry.histogram("camera_fetch_seconds", camera=self.host).observe(
+            time.perf_counter() - started)
+        return jpeg
+
+    def fetch_frame(self, deadline=None):
+        """Capture and decode to an ``(H, W, 3)`` uint8 array."""
+        return decode_frame(self.fetch_jpeg(deadline))
+
+    def remember_status(self, status):
+        """Seed the cached ``/status`` (e.g. from discovery) so the next diff skips a fetch."""
+        self._status = dict(status)
+        self._status_at = time.monotonic()
+
+    def status(self, deadline=None, max_age=STATUS_TTL):
+        """Current sensor settings from ``/status``, cached for ``max_age`` seconds."""
+        if self._status is None or time.monotonic() - self._status_at > max_age:
+            body = self.get("/status", deadline=deadline)
+            try:
+                status = json.loads(body)
+            except ValueError as e:
+                raise CameraError(f"{self.host}: invalid /status response: {e}")
+            self.remember_status(status)
+        return dict(self._status)
+
+    def cached_status(self, max_age=STATUS_TTL):
+        """The cached ``/status`` if younger than ``max_age``, else ``None``; never hits the network."""
+        if self._status is None or time.monotonic() - self._status_at > max_age:
+            return None
+        return dict(self._status)
+
+    def apply_settings(self, settings, deadline=None, refresh=False):
+        """
+        Write only the settings that differ from the camera's current state.
+
+        ``settings`` maps ``/status`` keys to values, e.g.
+        ``{"framesize": 12, "xclk": 20, "quality": 10}``. Writes go one after
+        another over the pooled keep-alive connection, all within one
+        deadline. Returns the dict of settings actually written.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        current = self.status(deadline_at - time.monotonic(), max_age=0 if refresh else STATUS_TTL)
+        changed = {k: v for k, v in settings.items() if current.get(k) != v}
+        for var, value in changed.items():
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise CameraError(f"{self.host}: deadline exceeded after {len(changed)} writes")
+            if var == "xclk":
+                self.get("/xclk", params={"xclk": value}, deadline=remaining)
+            else:
+                self.get("/control", params={"var": var, "val": value}, deadline=remaining)
+            self._status[var] = value
+            registry.counter("camera_settings_written_total").inc()
+        if changed:
+            logger.info("Applied %s to %s", changed, self.host)
+        return changed
+
+    def close(self):
+        self.session.close()
+
+
+def decode_frame(jpeg):
+    """
+    Decode JPEG bytes to an RGB array.
+
+    The array is a read-only ``np.frombuffer`` view over Pillow's decoded
+    bytes, so the pixels are not copied a second time as ``np.array``
+    would do.
+    """
+    with Image.open(BytesIO(jpeg)) as image:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        data = image.tobytes()
+    return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+
+def apply_fleet(hosts, settings, deadline=None, workers=FLEET_WORKERS):
+    """
+    Apply ``settings`` to many cameras in parallel.
+
+    Returns ``{host: {"success", "message", "changed"}}``; one failing
+    camera does not stop the others.
+    """
+    def apply(host):
+        try:
+            changed = get_camera(host).apply_settings(settings, deadline=deadline)
+        except CameraError as e:
+            return {"success": False, "message": str(e), "changed": {}}
+        message = f"Updated {', '.join(changed)}" if changed else "Already up to date"
+        return {"success": True, "message": message, "changed": changed}
+
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+    with ThreadPoolExecutor(min(workers, len(hosts)), thread_name_prefix="camera-config") as pool:
+        return dict(zip(hosts, pool.map(apply, hosts)))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_camera(host):
+    """Process-wide :class:`CameraClient` for ``host``, so connections are reused."""
+    client = _clients.get(host)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(host)
+            if client is None:
+                client = _clients[host] = CameraClient(host)
+    return client
+
+
+def peek_status(host, max_age=STATUS_TTL):
+    """Cached ``/status`` of ``host`` without creating a client or a request."""
+    client = _clients.get(host)
+    return client.cached_status(max_age) if client is not None else None
@@ -0,0 +1,146 @@
+import json
+
+# Lahan (sawah) default bila pemanggil tidak menyebutkan
+DEFAULT_FIELD = "sawah1"
+# Topik yang dikirim perangkat: status/<field>/<device> dan detection/<field>/<device>
+TELEMETRY_TOPICS = ("status/+/+", "detection/+/+")
+
+
+class Param:
+    """Schema for one payload parameter and its wire encoding."""
+    def __init__(self, name, type=int, minimum=None, maximum=None):
+        self.name = name
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def encode(self, value):
+        if self.type is int:
+            if isinstance(value, bool) or not isinstance(value, int):
+                value = int(value)
+            self._check_range(value)
+            return b"%d" % value
+        if self.type is float:
+            value = float(value)
+            self._check_range(value)
+            return repr(value).encode()
+        return json.dumps(self.type(value)).encode()
+
+    def _check_range(self, value):
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"{self.name}={value} is below {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"{self.name}={value} is above {self.maximum}")
+
+
+class Command:
+    """
+    Declarative MQTT command.
+
+    ``topic`` is a template with a ``{field}`` slot for the paddy field the
+    device belongs to. ``payload`` is a JSON-compatible dict in which
+    :class:`Param` instances mark the values filled in per call. The payload
+    is serialized once at registration into constant byte chunks, so a
+    dispatch only encodes the parameters and joins the chunks.
+
+    ``state`` names the key in the device's status payload that a setting
+    command changes; commands without it are one-off actions.
+    """
+    def __init__(self, name, topic, payload, description="", qos=1, state=None):
+        self.name = name
+        self.topic_template = topic
+        self.description = description or name
+        self.qos = qos
+        self.state = state
+        # <kind>/{field}/<device>/...
+        self.device = topic.split("/")[2]
+        self.params = {}
+        self._chunks = self._compile(payload)
+        self._topics = {}
+
+    def _compile(self, payload):
+        markers = {}
+
+        def mark(value):
+            if isinstance(value, Param):
+                self.params[value.name] = value
+                marker = f"@@{value.name}@@"
+                markers[json.dumps(marker)] = value.name
+                return marker
+            if isinstance(value, dict):
+                return {k: mark(v) for k, v in value.items()}
+            return value
+
+        text = json.dumps(mark(payload), separators=(",", ":"))
+        chunks = []
+        while markers:
+            token, pos = min(((t, text.find(t)) for t in markers), key=lambda item: item[1])
+            chunks.append(text[:pos].encode())
+            chunks.append(markers.pop(token))
+            text = text[pos + len(token):]
+        chunks.append(text.encode())
+        return [c for c in chunks if c != b""]
+
+    def topic(self, field=DEFAULT_FIELD):
+        topic = self._topics.get(field)
+        if topic is None:
+            topic = self._topics[field] = self.topic_template.format(field=field)
+        return topic
+
+    def encode(self, **values):
+        """Fill the payload template; unknown or missing parameters raise ``ValueError``."""
+        unknown = set(values) - set(self.params)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) for {self.name}: {', '.join(sorted(unknown))}")
+        if not self.params:
+            return self._chunks[0]
+        try:
+            return b"".join(c if isinstance(c, bytes) else self.params[c].encode(values[c])
+                            for c in self._chunks)
+        except KeyError as e:
+            raise ValueError(f"Missing parameter {e.args[0]} for {self.name}") from None
+
+
+class CommandRegistry:
+    """Lookup of commands by name."""
+    def __init__(self, commands=()):
+        self._commands = {}
+        for command in commands:
+            self.register(command)
+
+    def register(self, command):
+        if command.name in self._commands:
+            raise ValueError(f"Command {command.name} already registered")
+        self._commands[command.name] = command
+        return command
+
+    def get(self, name):
+        try:
+            return self._commands[name]
+        except KeyError:
+            raise KeyError(f"Unknown command: {name}") from None
+
+    def __contains__(self, name):
+        return name in self._commands
+
+    def __iter__(self):
+        return iter(self._commands.values())
+
+
+commands = CommandRegistry([
+    Command("play_test_sound", "control/{field}/mp3player/play",
+            {"action": "play sound test"},
+            description="Success play test sound"),
+    Command("stop_sound", "control/{field}/mp3player/stop",
+            {"action": "stop sound"},
+            description="Success stop sound"),
+    Command("set_default_sound", "setting/{field}/mp3player/default_filenumber",
+            {"filenumber": Param("filenumber", int, 0, 100)},
+            description="Success set default sound", state="default_filenumber"),
+    Command("set_volume", "control/{field}/mp3player/set_volume",
+            {"value": Param("value", int, 0, 30)},
+            description="Success set volume speaker", state="volume"),
+    Command("play_sound_file", "control/{field}/mp3player/play",
+            {"action": "play sound file", "filenumber": Param("filenumber", int, 0, 100)},
+            description="Success play sound file"),
+])
@@ -0,0 +1,264 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+from nodes.metrics import registry
+from nodes.telemetry import device_time
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+# Awal indeks rollup (2024-01-01 UTC); bucket ke-i = BASE_TS + i * lebar bucket
+BASE_TS = 1704067200
+EVENT_DTYPE = np.dtype([("ts", "<f8"), ("camera", "<u2"), ("count", "<u4"), ("confidence", "<f4")])
+ALL_CAMERAS = 0
+FLUSH_INTERVAL = 1.0
+FLUSH_EVENTS = 256
+# Event yang menunggu thread penulis; bila penuh, event baru dibuang (dan dihitung)
+MAX_QUEUED_EVENTS = 10000
+# Bucket rollup paling jauh ke depan dari jam server; batas ukuran file memmap
+FUTURE_MARGIN = DAY
+
+
+class _Rollup:
+    """Counts per fixed-width time bucket, kept in a memory-mapped file."""
+    GROW_BUCKETS = 1024
+
+    def __init__(self, path, width, offset=0):
+        self.path = path
+        self.width = width
+        self.offset = offset
+        self._map = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._map = np.memmap(path, dtype="<u4", mode="r+")
+
+    def index(self, ts):
+        return int((ts + self.offset - BASE_TS) // self.width)
+
+    def add(self, ts, count):
+        idx = self.index(ts)
+        if idx < 0 or idx > self.index(time.time() + FUTURE_MARGIN):
+            # Timestamp di luar jangkauan akan memperbesar file tanpa batas
+            return False
+        if self._map is None or idx >= len(self._map):
+            self._grow(idx + 1)
+        self._map[idx] += count
+        return True
+
+    def _grow(self, size):
+        size = -(-size // self.GROW_BUCKETS) * self.GROW_BUCKETS
+        with open(self.path, "ab") as f:
+            f.truncate(size * 4)
+        # Pembaca lama tetap memegang map sebelumnya; file hanya diperpanjang
+        self._map = np.memmap(self.path, dtype="<u4", mode="r+")
+
+    def slice(self, start_idx, end_idx):
+        """Counts for buckets ``[start_idx, end_idx)``, zero-filled where nothing was recorded."""
+        out = np.zeros(end_idx - start_idx, dtype=np.int64)
+        data = self._map
+        if data is None:
+            return out
+        lo, hi = max(start_idx, 0), min(end_idx, len(data))
+        if lo < hi:
+            out[lo - start_idx:hi - start_idx] = data[lo:hi]
+        return out
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+
+class DetectionStore:
+    """
+    Append-only store of bird-detection events with hourly and daily rollups.
+
+    Raw events are appended to one binary segment per UTC day
+    (``events-YYYYMMDD.bin``, fixed-width records readable with
+    ``np.memmap``). Each event also increments memory-mapped hourly and
+    daily counters, per camera and for all cameras together, so dashboard
+    queries read ``O(buckets)`` values however many events were stored.
+    Everything lives under ``root`` and survives restarts.
+
+    :meth:`record` only enqueues, so it is safe to call from the MQTT
+    network thread. A single writer thread assigns camera ids, bumps the
+    rollups and appends segments, flushing at least every
+    ``FLUSH_INTERVAL`` seconds. Readers take ``_lock`` only to look up a
+    rollup, never while the writer does file I/O.
+    """
+    def __init__(self, root, tz_offset=None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        if tz_offset is None:
+            tz_offset = time.localtime().tm_gmtoff
+        self.tz_offset = tz_offset
+        # Hanya menjaga dict _cameras/_hourly/_daily; I/O file tidak pernah di bawah lock ini
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+        # Dimiliki thread penulis saja
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._cameras_path = os.path.join(root, "cameras.json")
+        self._cameras = {}
+        if os.path.exists(self._cameras_path):
+            with open(self._cameras_path) as f:
+                self._cameras = json.load(f)
+        self._hourly = {}
+        self._daily = {}
+        self._writer = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    # --------------------------------------------------------------- write
+    def camera_id(self, camera):
+        """Id of ``camera``; new cameras are assigned one and saved. Runs on the writer thread."""
+        camera_id = self._cameras.get(camera)
+        if camera_id is None:
+            with self._lock:
+                camera_id = len(self._cameras) + 1
+                self._cameras[camera] = camera_id
+                cameras = dict(self._cameras)
+            tmp = self._cameras_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(cameras, f)
+            os.replace(tmp, self._cameras_path)
+        return camera_id
+
+    def record(self, camera, ts=None, count=1, confidence=float("nan")):
+        """
+        Queue one detection event for the writer thread; never blocks.
+
+        ``ts`` is checked with :func:`~nodes.telemetry.device_time`, so a
+        device clock in milliseconds or far off falls back to now.
+        """
+        ts = device_time(ts)
+        try:
+            self._queue.put_nowait((camera, ts, count, confidence))
+        except queue.Full:
+            registry.counter("detections_dropped_total").inc()
+
+    def _rollup(self, rollups, camera_id, width, offset):
+        rollup = rollups.get(camera_id)
+        if rollup is None:
+            with self._lock:
+                rollup = rollups.get(camera_id)
+                if rollup is None:
+                    name = "hourly" if width == HOUR else "daily"
+                    path = os.path.join(self.root, f"{name}-{camera_id}.u4")
+                    rollup = rollups[camera_id] = _Rollup(path, width, offset)
+        return rollup
+
+    def flush(self, timeout=5.0):
+        """Write every event recorded so far to the segments and sync the rollups."""
+        if not self._writer.is_alive():
+            self._drain()
+            self._flush()
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            timeout = max(0.0, self._last_flush + FLUSH_INTERVAL - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            try:
+                if isinstance(item, threading.Event):
+                    self._flush()
+                    item.set()
+                    continue
+                if item is not None:
+                    self._apply(*item)
+                if (len(self._pending) >= FLUSH_EVENTS
+                        or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+                    self._flush()
+            except Exception as e:
+                logger.error("Detection writer failed: %s", e)
+
+    def _drain(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                self._apply(*item)
+
+    def _apply(self, camera, ts, count, confidence):
+        if not BASE_TS <= ts <= time.time() + FUTURE_MARGIN:
+            registry.counter("detections_rejected_total").inc()
+            return
+        camera_id = self.camera_id(camera)
+        for cid in (camera_id, ALL_CAMERAS):
+            self._rollup(self._hourly, cid, HOUR, 0).add(ts, count)
+            self._rollup(self._daily, cid, DAY, self.tz_offset).add(ts, count)
+        self._pending.append((ts, camera_id, count, confidence))
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        events = np.array(self._pending, dtype=EVENT_DTYPE)
+        self._pending = []
+        days = (events["ts"] // DAY).astype(np.int64)
+        for day in np.unique(days):
+            path = self._segment_path(day * DAY)
+            with open(path, "ab") as f:
+                f.write(events[days == day].tobytes())
+        for rollup in list(self._hourly.values()) + list(self._daily.values()):
+            rollup.flush()
+
+    def _segment_path(self, ts):
+        return os.path.join(self.root, time.strftime("events-%Y%m%d.bin", time.gmtime(ts)))
+
+    # ---------------------------------------------------------------- read
+    def cameras(self):
+        return sorted(self._cameras)
+
+    def _series(self, rollups, width, offset, start, end, camera):
+        camera_id = ALL_CAMERAS if camera is None else self._cameras.get(camera)
+        first = int((start + offset - BASE_TS) // width)
+        last = int((end + offset - BASE_TS) // width) + 1
+        bucket_ts = BASE_TS - offset + np.arange(first, last, dtype=np.int64) * width
+        if camera_id is None:
+            return bucket_ts, np.zeros(len(bucket_ts), dtype=np.int64)
+        rollup = self._rollup(rollups, camera_id, width, offset)
+        return bucket_ts, rollup.slice(first, last)
+
+    def hourly(self, start, end=None, camera=None):
+        """``(bucket_start_ts, counts)`` for every hour from ``start`` to ``end``."""
+        return self._series(self._hourly, HOUR, 0, start, end or time.time(), camera)
+
+    def daily(self, start, end=None, camera=None):
+        """``(bucket_start_ts, counts)`` per local day from ``start`` to ``end``."""
+        return self._series(self._daily, DAY, self.tz_offset, start, end or time.time(), camera)
+
+    def events(self, start, end=None, camera=None):
+        """Raw events between ``start`` and ``end``, read from the day segments."""
+        end = end or time.time()
+        self.flush()
+        parts = []
+        for day in range(int(start // DAY), int(end // DAY) + 1):
+            path = self._segment_path(day * DAY)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+            data = np.memmap(path, dtype=EVENT_DTYPE, mode="r")
+            mask = (data["ts"] >= start) & (data["ts"] < end)
+            if camera is not None:
+                mask &= data["camera"] == self._cameras.get(camera, -1)
+            parts.append(data[mask])
+        if not parts:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        return np.concatenate(parts)
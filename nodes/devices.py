@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import threading
+import time
+from nodes.commands import DEFAULT_FIELD
+
+logger = logging.getLogger(__name__)
+
+SPEAKER = "speaker"
+CAMERA = "camera"
+SENSOR = "sensor"
+KINDS = (SPEAKER, CAMERA, SENSOR)
+# Nama device MQTT untuk speaker, sesuai topik control/<field>/mp3player/...
+SPEAKER_DEVICE = "mp3player"
+# Status lebih tua dari ini dianggap basi; lebih tua dari OFFLINE_AFTER dianggap offline (detik)
+STALE_AFTER = 120
+OFFLINE_AFTER = 600
+# Urutan tampil status di ringkasan armada
+STATES = ("online", "stale", "offline", "unknown")
+
+
+class Device:
+    """One device in a paddy field: a speaker, a camera or a sensor node."""
+    __slots__ = ("field", "kind", "name", "address")
+
+    def __init__(self, field, kind, name, address=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown device kind {kind!r}, expected one of {', '.join(KINDS)}")
+        self.field = field
+        self.kind = kind
+        self.name = name
+        # IP kamera; untuk speaker dan sensor sama dengan nama device di topik MQTT
+        self.address = address or name
+
+    @property
+    def key(self):
+        return f"{self.field}/{self.name}"
+
+    def __repr__(self):
+        return f"Device({self.field!r}, {self.kind!r}, {self.name!r})"
+
+
+class DeviceRegistry:
+    """
+    Fields and the devices installed in them, indexed for lookup.
+
+    Loaded once per process. Lookups by key, by field and by kind are dict
+    reads. Devices may be added from the MQTT network thread while the UI
+    reads; readers always iterate over copies.
+    """
+    def __init__(self, devices=()):
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._by_field = {}
+        self._by_kind = {kind: [] for kind in KINDS}
+        for device in devices:
+            self.add(device)
+
+    def add(self, device):
+        with self._lock:
+            if device.key in self._devices:
+                return self._devices[device.key]
+            self._devices[device.key] = device
+            self._by_field.setdefault(device.field, []).append(device)
+            self._by_kind[device.kind].append(device)
+        return device
+
+    def get(self, field, name):
+        return self._devices.get(f"{field}/{name}")
+
+    def fields(self, kind=None):
+        """Field names, sorted; only fields that have a ``kind`` device when given."""
+        if kind is None:
+            return sorted(self._by_field)
+        return sorted({device.field for device in self._by_kind[kind]})
+
+    def devices(self, field=None, kind=None):
+        if field is not None and kind is not None:
+            return [d for d in self._by_field.get(field, ()) if d.kind == kind]
+        if field is not None:
+            return list(self._by_field.get(field, ()))
+        if kind is not None:
+            return list(self._by_kind[kind])
+        return list(self._devices.values())
+
+    def counts(self):
+        """``{field: {kind: count}}`` for the fleet summary."""
+        counts = {}
+        for field, devices in list(self._by_field.items()):
+            per_kind = counts[field] = dict.fromkeys(KINDS, 0)
+            for device in devices:
+                per_kind[device.kind] += 1
+        return counts
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(list(self._devices.values()))
+
+    def observe(self, kind, field, device, data, ts):
+        """
+        Telemetry listener: register devices that report but are not configured.
+
+        Devices other than the speaker are taken to be sensors.
+        """
+        if self.get(field, device) is None:
+            kind = SPEAKER if device == SPEAKER_DEVICE else SENSOR
+            self.add(Device(field, kind, device))
+            logger.info("Registered device %s/%s (%s) from telemetry", field, device, kind)
+
+    @classmethod
+    def from_dict(cls, config):
+        """
+        Build from ``{"fields": {<field>: {"speakers": [...], "cameras": [...], "sensors": [...]}}}``.
+
+        Cameras are listed by IP (or ``host:port``); speakers and sensors by
+        their MQTT device name.
+        """
+        registry = cls()
+        for field, groups in config.get("fields", {}).items():
+            for kind in KINDS:
+                for name in groups.get(kind + "s", ()):
+                    registry.add(Device(field, kind, name))
+        return registry
+
+    @classmethod
+    def load(cls, path=None, default_field=DEFAULT_FIELD, camera_ips=()):
+        """
+        Load the registry from a JSON file at ``path``.
+
+        Without a file, fall back to a single ``default_field`` with one
+        speaker and the given ``camera_ips``, which is what the dashboard
+        managed before the registry existed.
+        """
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    registry = cls.from_dict(json.load(f))
+                logger.info("Loaded %d devices in %d fields from %s",
+                            len(registry), len(registry.fields()), path)
+                return registry
+            except (OSError, ValueError) as e:
+                logger.error("Failed to load device registry %s: %s", path, e)
+        registry = cls([Device(default_field, SPEAKER, SPEAKER_DEVICE)])
+        for ip in camera_ips:
+            registry.add(Device(default_field, CAMERA, ip))
+        return registry
+
+
+def device_state(last_seen, now=None):
+    """``online``, ``stale``, ``offline`` or ``unknown`` from the last report time."""
+    if last_seen is None:
+        return "unknown"
+    age = (now or time.time()) - last_seen
+    if age <= STALE_AFTER:
+        return "online"
+    if age <= OFFLINE_AFTER:
+        return "stale"
+    return "offline"
+
+
+def fleet_snapshot(registry, telemetry=None, camera_status=None, analyses=None, now=None):
+    """
+    One row per registered device, read from in-memory state only.
+
+    ``telemetry`` supplies the last status payload and report time of MQTT
+    devices, ``camera_status(host)`` the cached ``/status`` of a camera
+    (or ``None``) and ``analyses(host)`` its latest
+    :class:`~nodes.scheduler.AnalysisResult`. Nothing here touches the
+    network, so the page stays fast however many devices there are.
+    """
+    now = now or time.time()
+    rows = []
+    for device in registry:
+        row = {"field": device.field, "kind": device.kind, "device": device.name,
+               "state": "unknown", "last_seen": None, "detail": ""}
+        if device.kind == CAMERA:
+            status = camera_status(device.address) if camera_status else None
+            result = analyses(device.address) if analyses else None
+            if result is not None:
+                if result.status == "ok":
+                    row["last_seen"] = result.finished
+                row["detail"] = f"analysis {result.status}"
+            if status:
+                row["detail"] = " · ".join(filter(None, [
+                    f"framesize {status.get('framesize')}", f"xclk {status.get('xclk')}",
+                    row["detail"]]))
+            row["state"] = "online" if status else device_state(row["last_seen"], now)
+        elif telemetry is not None:
+            last_seen = telemetry.last_seen.get(device.key)
+            data = telemetry.latest_status.get(device.key) or {}
+            row["last_seen"] = last_seen
+            row["state"] = device_state(last_seen, now)
+            row["detail"] = ", ".join(f"{k}={v}" for k, v in data.items() if k != "ts")
+        rows.append(row)
+    return rows
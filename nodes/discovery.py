@@ -0,0 +1,127 @@
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from nodes.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Koneksi TCP paralel saat memindai; /24 selesai dalam satu gelombang
+DEFAULT_WORKERS = 256
+CONNECT_TIMEOUT = 0.5
+FINGERPRINT_TIMEOUT = (0.5, 1.5)
+DEFAULT_TTL = 300
+# Cegah pemindaian tidak sengaja atas jaringan yang sangat besar
+MAX_HOSTS = 4096
+# Kunci JSON /status dari firmware CameraWebServer ESP32
+ESP32_STATUS_KEYS = {"framesize", "quality", "xclk"}
+
+
+def local_subnet(prefix=24):
+    """Guess the server's LAN as ``a.b.c.0/prefix`` from the default route's source address."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            # UDP connect tidak mengirim paket, hanya memilih interface
+            s.connect(("10.255.255.255", 1))
+            address = s.getsockname()[0]
+    except OSError:
+        return None
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+class CameraDiscovery:
+    """
+    Finds ESP32-CAM boards on a subnet.
+
+    Every host in the range gets a TCP connect to the camera port with a
+    short timeout, all in flight at once on a thread pool. Hosts that accept
+    are fingerprinted by fetching ``/status`` and checking for the
+    CameraWebServer keys. Results are cached per range for ``ttl`` seconds.
+    """
+    def __init__(self, port=80, workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL,
+                 connect_timeout=CONNECT_TIMEOUT):
+        self.port = port
+        self.workers = workers
+        self.ttl = ttl
+        self.connect_timeout = connect_timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._scan_locks = {}
+
+    @staticmethod
+    def _network(cidr):
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        if network.num_addresses > MAX_HOSTS:
+            raise ValueError(f"{cidr} has {network.num_addresses} addresses, limit is {MAX_HOSTS}")
+        return network
+
+    def cached(self, cidr):
+        """Return ``(scanned_at, cameras)`` of a scan still within the TTL, or None."""
+        try:
+            key = str(self._network(cidr))
+        except ValueError:
+            return None
+        entry = self._cache.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def scan(self, cidr, refresh=False):
+        """
+        Return the cameras in ``cidr`` as a list of dicts sorted by IP.
+
+        Uses the cached result unless it expired or ``refresh`` is set.
+        Concurrent scans of the same range share one sweep.
+        """
+        network = self._network(cidr)
+        key = str(network)
+        hosts = [str(ip) for ip in network.hosts()] or [str(network.network_address)]
+        with self._lock:
+            scan_lock = self._scan_locks.setdefault(key, threading.Lock())
+        with scan_lock:
+            entry = None if refresh else self.cached(cidr)
+            if entry is not None:
+                return entry[1]
+            started = time.perf_counter()
+            cameras = self._sweep(hosts)
+            elapsed = time.perf_counter() - started
+            self._cache[key] = (time.time(), cameras)
+        registry.histogram("discovery_scan_seconds").observe(elapsed)
+        logger.info("Scanned %d hosts in %s in %.2fs, found %d cameras",
+                    len(hosts), key, elapsed, len(cameras))
+        return cameras
+
+    def _sweep(self, hosts):
+        with ThreadPoolExecutor(min(self.workers, len(hosts)),
+                                thread_name_prefix="discovery") as pool:
+            open_hosts = [h for h, ok in zip(hosts, pool.map(self._probe, hosts)) if ok]
+            # map() menjaga urutan, jadi hasil tetap terurut menurut IP
+            return [c for c in pool.map(self._fingerprint, open_hosts) if c is not None]
+
+    def _probe(self, host):
+        try:
+            with socket.create_connection((host, self.port), timeout=self.connect_timeout):
+                return True
+        except OSError:
+            return False
+
+    def _fingerprint(self, host):
+        address = host if self.port == 80 else f"{host}:{self.port}"
+        started = time.perf_counter()
+        try:
+            response = requests.get(f"http://{address}/status", timeout=FINGERPRINT_TIMEOUT)
+            status = response.json() if response.ok else None
+        except (requests.RequestException, ValueError):
+            return None
+        if not isinstance(status, dict) or not ESP32_STATUS_KEYS <= status.keys():
+            return None
+        return {
+            "ip": address,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "framesize": status.get("framesize"),
+            "xclk": status.get("xclk"),
+            "status": status,
+        }
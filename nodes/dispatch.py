@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from nodes.commands import commands, DEFAULT_FIELD
+from nodes.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Perubahan beruntun dalam jendela ini digabung menjadi satu perintah
+DEFAULT_DEBOUNCE = 0.5
+
+
+class _Pending:
+    __slots__ = ("command", "field", "params", "mirror", "due")
+
+    def __init__(self, command, field, params, mirror, due):
+        self.command = command
+        self.field = field
+        self.params = params
+        self.mirror = mirror
+        self.due = due
+
+
+class CommandDispatcher:
+    """
+    Debounced, deduplicated delivery of setting commands.
+
+    Commands are keyed by field, device and setting. A new value for a key
+    that is still waiting replaces the old one and restarts its
+    ``debounce`` window, so dragging a slider sends only the final value. A
+    value the device already has is dropped: the newer of the device's
+    last reported status (``status/<field>/<device>``) and the last
+    value this process sent decides what the device has. Commands without a
+    ``state`` (plain actions) are debounced but never dropped.
+    """
+    def __init__(self, mqtt_client, telemetry=None, ubidots_client=None, debounce=DEFAULT_DEBOUNCE):
+        self.mqtt_client = mqtt_client
+        self.ubidots_client = ubidots_client
+        self.debounce = debounce
+        self._pending = {}
+        # key -> (params, waktu kirim, handle publish)
+        self._sent = {}
+        # (field, device) -> (status terakhir, waktu diterima)
+        self._reported = {}
+        self._results = {}
+        self._cond = threading.Condition()
+        self._worker = None
+        if telemetry is not None:
+            telemetry.add_listener(self._on_telemetry)
+
+    @staticmethod
+    def _key(command, field):
+        return field, command.device, command.state or command.name
+
+    def _on_telemetry(self, kind, field, device, data, ts):
+        if kind == "status":
+            self._reported[(field, device)] = (data, time.time())
+
+    def _device_has(self, command, field, params):
+        if command.state is None:
+            return False
+        sent = self._sent.get(self._key(command, field))
+        reported, reported_at = self._reported.get((field, command.device), (None, 0.0))
+        if sent is not None and sent[1] >= reported_at:
+            sent_params, _, handle = sent
+            return sent_params == params and (handle is None or handle.error is None)
+        if reported is not None and command.state in reported and len(params) == 1:
+            return reported[command.state] == next(iter(params.values()))
+        return False
+
+    def submit(self, name, field=DEFAULT_FIELD, mirror=None, **params):
+        """
+        Schedule ``name`` for ``field`` after the debounce window.
+
+        ``mirror`` is an optional ``{variable: value}`` dict sent to Ubidots
+        only if the command is actually dispatched.
+            :return: dict with ``success``, ``pending``, ``skipped`` and ``message``
+        """
+        command = commands.get(name)
+        try:
+            command.encode(**params)
+        except ValueError as e:
+            logger.error("Invalid parameters for %s: %s", name, e)
+            return {"success": False, "pending": False, "skipped": False, "message": str(e)}
+        key = self._key(command, field)
+        with self._cond:
+            if self._device_has(command, field, params):
+                # Nilai sama dengan kondisi perangkat; batalkan juga nilai lain yang masih menunggu
+                self._pending.pop(key, None)
+                registry.counter("dispatch_skipped_total", command=name).inc()
+                return {"success": True, "pending": False, "skipped": True,
+                        "message": "Device already has this setting"}
+            if key in self._pending:
+                registry.counter("dispatch_coalesced_total", command=name).inc()
+            self._pending[key] = _Pending(command, field, params, mirror,
+                                          time.monotonic() + self.debounce)
+            self._ensure_worker()
+            self._cond.notify()
+        return {"success": True, "pending": True, "skipped": False,
+                "message": f"{name} scheduled for {field}"}
+
+    def last_result(self, name, field=DEFAULT_FIELD):
+        """Result dict of the most recent dispatch of ``name`` to ``field``, if any."""
+        return self._results.get(self._key(commands.get(name), field))
+
+    def flush(self):
+        """Send everything still waiting now, skipping the rest of the debounce window."""
+        with self._cond:
+            for item in self._pending.values():
+                item.due = 0.0
+            self._cond.notify()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="command-dispatch", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    key, item = min(self._pending.items(), key=lambda kv: kv[1].due)
+                    delay = item.due - time.monotonic()
+                    if delay <= 0:
+                        del self._pending[key]
+                        break
+                    self._cond.wait(delay)
+            try:
+                self._dispatch(key, item)
+            except Exception as e:
+                logger.error("Dispatch of %s failed: %s", item.command.name, e)
+
+    def _dispatch(self, key, item):
+        command = item.command
+        with self._cond:
+            if self._device_has(command, item.field, item.params):
+                registry.counter("dispatch_skipped_total", command=command.name).inc()
+                return
+        result = self.mqtt_client.send_command(command.name, item.field, **item.params)
+        registry.counter("dispatch_sent_total", command=command.name).inc()
+        with self._cond:
+            self._sent[key] = (item.params, time.time(), result.get("handle"))
+            self._results[key] = result
+        if item.mirror and self.ubidots_client is not None and result["success"]:
+            self.ubidots_client.send_data_async(item.mirror)
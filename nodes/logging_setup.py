@@ -0,0 +1,136 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+QUEUE_SIZE = 10000
+# File log per modul (selain log utama); nama logger -> file
+MODULE_FILES = {
+    "nodes.mqtt_client": "mqtt_client.log",
+    "nodes.ubidots_client": "ubidots_client.log",
+}
+MAIN_FILE = "streamlit_app.log"
+PAYLOAD_PREVIEW = 200
+
+_lock = threading.Lock()
+_listener = None
+_handler = None
+
+
+class LazyPayload:
+    """
+    Log argument that decodes and truncates a payload only when formatted.
+
+    Pass it instead of ``payload.decode()`` so a message below the active
+    level, or one that is dropped, never pays for decoding.
+    """
+    __slots__ = ("payload", "limit")
+
+    def __init__(self, payload, limit=PAYLOAD_PREVIEW):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self):
+        data = self.payload[:self.limit]
+        text = data.decode("utf-8", "replace") if isinstance(data, (bytes, bytearray)) else str(data)
+        if len(self.payload) > self.limit:
+            text += f"... ({len(self.payload)} bytes)"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats on the caller's thread."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Format ditunda ke thread listener; jangan kirim argumen log yang masih akan diubah
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _PrefixFilter(logging.Filter):
+    def __init__(self, prefixes, exclude=False):
+        super().__init__()
+        self.prefixes = tuple(prefixes)
+        self.exclude = exclude
+
+    def filter(self, record):
+        return record.name.startswith(self.prefixes) != self.exclude
+
+
+def setup_logging(level=None, json_lines=None, log_dir=None):
+    """
+    Route all logging through one queue to console and rotating files.
+
+    Safe to call more than once; only the first call configures anything.
+    Records from ``MODULE_FILES`` loggers go to their own file, all others
+    to ``streamlit_app.log``; everything goes to the console. Defaults come
+    from the ``LOG_LEVEL``, ``LOG_FORMAT`` (``text`` or ``json``) and
+    ``LOG_DIR`` environment variables.
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _handler
+        level = level or os.getenv("LOG_LEVEL", "INFO")
+        if json_lines is None:
+            json_lines = os.getenv("LOG_FORMAT", "text").lower() == "json"
+        log_dir = log_dir or os.getenv("LOG_DIR", ".")
+        formatter = JsonFormatter() if json_lines else logging.Formatter(TEXT_FORMAT)
+
+        handlers = [logging.StreamHandler()]
+        main_file = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, MAIN_FILE), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
+        main_file.addFilter(_PrefixFilter(MODULE_FILES, exclude=True))
+        handlers.append(main_file)
+        for name, filename in MODULE_FILES.items():
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(log_dir, filename), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
+            handler.addFilter(_PrefixFilter([name]))
+            handlers.append(handler)
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _handler = _DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+        root = logging.getLogger()
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.addHandler(_handler)
+        _listener = logging.handlers.QueueListener(_handler.queue, *handlers,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _handler
+
+
+def dropped_records():
+    """Number of log records discarded because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
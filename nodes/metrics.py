@@ -0,0 +1,222 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Content-Type format teks Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Monotonically increasing count."""
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down, e.g. messages in flight."""
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Histogram:
+    """
+    Latency histogram over a sliding window of recent samples.
+
+    Percentiles are computed from the last ``window`` observations so the
+    numbers follow current link conditions; ``count`` and ``sum`` cover the
+    whole lifetime of the process.
+    """
+    def __init__(self, window=2048):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager that observes the seconds spent inside the block."""
+        return _Timer(self)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {q: None for q in quantiles}
+        last = len(samples) - 1
+        return {q: samples[min(last, int(round(q * last)))] for q in quantiles}
+
+    def snapshot(self):
+        p = self.percentiles()
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": p[0.5],
+            "p95": p[0.95],
+            "p99": p[0.99],
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "started", "elapsed")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.elapsed = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed)
+        return False
+
+
+class MetricsRegistry:
+    """Process-wide store of named metrics, keyed by name and labels."""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls()
+                    self._metrics[key] = metric
+        if not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} already registered as {type(metric).__name__}")
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self._get(Histogram, name, labels)
+
+    def timer(self, name, **labels):
+        """``with registry.timer("x_seconds"):`` records the block's duration in histogram ``name``."""
+        return self.histogram(name, **labels).time()
+
+    def collect(self, name=None):
+        """Return ``(name, labels, metric)`` tuples, optionally for one name only."""
+        with self._lock:
+            items = list(self._metrics.items())
+        return [(n, dict(labels), metric) for (n, labels), metric in items
+                if name is None or n == name]
+
+    def exposition(self):
+        """
+        All metrics in the Prometheus text format.
+
+        Counters and gauges map directly; histograms are exported as
+        summaries (p50/p95/p99 over the sliding window plus lifetime
+        ``_sum`` and ``_count``).
+        """
+        families = {}
+        for name, labels, metric in sorted(self.collect(), key=lambda item: item[0]):
+            families.setdefault(name, []).append((labels, metric))
+        lines = []
+        for name, members in families.items():
+            kind = {Counter: "counter", Gauge: "gauge", Histogram: "summary"}[type(members[0][1])]
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in members:
+                if kind != "summary":
+                    lines.append(f"{name}{_labels(labels)} {_number(metric.value)}")
+                    continue
+                for q, value in metric.percentiles().items():
+                    lines.append(f"{name}{_labels(labels, quantile=q)} {_number(value)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(metric.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for v in items.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(items, escaped)) + "}"
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - " + format, self.client_address[0], *args)
+
+
+def serve_metrics(port, host="127.0.0.1", metrics=None):
+    """
+    Serve ``GET /metrics`` in the Prometheus text format on a daemon thread.
+
+    Raises ``OSError`` if the port is taken. Returns the server; call
+    ``shutdown()`` on it to stop.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = metrics or registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+    return server
@@ -0,0 +1,265 @@
+import logging
+import random
+import re
+import threading
+import time
+import weakref
+import requests
+from nodes.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Server stream bawaan CameraWebServer ESP32 berjalan di port 81
+DEFAULT_STREAM_PORT = 81
+CONNECT_TIMEOUT = 3.0
+# Tanpa data selama ini, koneksi stream dianggap mati
+READ_TIMEOUT = 10.0
+CHUNK_SIZE = 16 * 1024
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+# Reader tetap hidup sebentar setelah penonton terakhir pergi, agar rerun tidak membuka ulang stream
+IDLE_GRACE = 5.0
+MAX_RECONNECT_DELAY = 10.0
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";,]+)"?', re.IGNORECASE)
+_LENGTH_RE = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+class MultipartParser:
+    """
+    Incremental parser for a ``multipart/x-mixed-replace`` body.
+
+    Bytes go in through :meth:`feed` in whatever pieces the socket returns;
+    every complete part comes back as its body bytes. Parts with a
+    ``Content-Length`` header (the ESP32 firmware sends one) are cut by
+    length, others at the next boundary.
+    """
+    def __init__(self, boundary, max_part=MAX_FRAME_BYTES):
+        boundary = boundary[2:] if boundary.startswith("--") else boundary
+        self.delimiter = b"--" + boundary.encode("latin-1")
+        self.max_part = max_part
+        self._buf = bytearray()
+        # Panjang body part yang sedang dibaca; None = masih mencari header
+        self._length = None
+        self._body_start = 0
+
+    def feed(self, data):
+        self._buf += data
+        parts = []
+        while True:
+            if self._length is None and not self._parse_headers():
+                break
+            part = self._take_body()
+            if part is None:
+                break
+            parts.append(part)
+        if len(self._buf) > self.max_part * 2:
+            logger.warning("Discarding %d unparseable stream bytes", len(self._buf))
+            self._reset()
+        return parts
+
+    def _reset(self):
+        self._buf.clear()
+        self._length = None
+
+    def _parse_headers(self):
+        start = self._buf.find(self.delimiter)
+        if start < 0:
+            # Simpan ekor yang mungkin awal delimiter berikutnya
+            del self._buf[:max(0, len(self._buf) - len(self.delimiter))]
+            return False
+        end = self._buf.find(b"\r\n\r\n", start)
+        if end < 0:
+            if start:
+                del self._buf[:start]
+            return False
+        match = _LENGTH_RE.search(self._buf, start, end)
+        self._length = int(match.group(1)) if match else -1
+        if self._length > self.max_part:
+            # Header rusak atau frame terlalu besar; cari part berikutnya lewat delimiter
+            self._length = -1
+        self._body_start = end + 4
+        return True
+
+    def _take_body(self):
+        start = self._body_start
+        if self._length >= 0:
+            end = start + self._length
+            if len(self._buf) < end:
+                return None
+        else:
+            end = self._buf.find(self.delimiter, start)
+            if end < 0:
+                return None
+            # Buang CRLF sebelum delimiter
+            while end > start and self._buf[end - 1] in b"\r\n":
+                end -= 1
+        if end - start > self.max_part:
+            logger.warning("Skipping oversized stream part (%d bytes)", end - start)
+            part = b""
+        else:
+            part = bytes(self._buf[start:end])
+        del self._buf[:end]
+        self._length = None
+        return part
+
+
+def stream_url(host, port=DEFAULT_STREAM_PORT):
+    """``http://host:81/stream``, unless ``host`` already names a port."""
+    if ":" in host:
+        return f"http://{host}/stream"
+    return f"http://{host}:{port}/stream"
+
+
+class MJPEGReader:
+    """
+    Background reader of one camera's MJPEG stream, shared by all viewers.
+
+    A single thread keeps the stream open while at least one viewer holds a
+    reference and stores only the newest frame with a sequence number.
+    Viewers render the latest frame at their own rate, so a slow viewer
+    skips frames instead of queueing them, and the camera serves exactly one
+    stream however many sessions are watching.
+    """
+    def __init__(self, url, idle_grace=IDLE_GRACE):
+        self.url = url
+        self.idle_grace = idle_grace
+        self.session = requests.Session()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._frame_ts = None
+        self._refs = 0
+        self._idle_since = time.monotonic()
+        self._thread = None
+        self.error = None
+
+    @property
+    def viewers(self):
+        return self._refs
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def acquire(self):
+        with self._cond:
+            self._refs += 1
+            if not self.running:
+                self._thread = threading.Thread(target=self._run, name=f"mjpeg-{self.url}",
+                                                daemon=True)
+                self._thread.start()
+        registry.gauge("mjpeg_viewers", url=self.url).inc()
+
+    def release(self):
+        with self._cond:
+            self._refs = max(0, self._refs - 1)
+            if not self._refs:
+                self._idle_since = time.monotonic()
+        registry.gauge("mjpeg_viewers", url=self.url).dec()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def latest(self):
+        """Return ``(seq, jpeg, ts)`` of the newest frame; ``jpeg`` is None before the first."""
+        with self._cond:
+            return self._seq, self._frame, self._frame_ts
+
+    def wait_frame(self, after_seq, timeout=None):
+        """Block until a frame newer than ``after_seq`` arrives; returns :meth:`latest`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            return self._seq, self._frame, self._frame_ts
+
+    def _idle(self):
+        return not self._refs and time.monotonic() - self._idle_since >= self.idle_grace
+
+    def _run(self):
+        delay = 0.5
+        while True:
+            with self._cond:
+                if self._idle():
+                    self._thread = None
+                    logger.info("Closing idle stream %s", self.url)
+                    return
+            try:
+                self._read_stream()
+                delay = 0.5
+            except (requests.RequestException, OSError, ValueError) as e:
+                self.error = str(e)
+                registry.counter("mjpeg_reconnects_total", url=self.url).inc()
+                logger.warning("Stream %s failed: %s", self.url, e)
+                time.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _read_stream(self):
+        with self.session.get(self.url, stream=True,
+                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            match = _BOUNDARY_RE.search(response.headers.get("Content-Type", ""))
+            if not match:
+                raise ValueError(f"not a multipart stream: {response.headers.get('Content-Type')}")
+            parser = MultipartParser(match.group(1))
+            logger.info("Opened stream %s", self.url)
+            self.error = None
+            frames = registry.counter("mjpeg_frames_total", url=self.url)
+            raw = response.raw
+            while True:
+                # read1 mengembalikan data yang sudah tersedia tanpa menunggu chunk penuh
+                data = raw.read1(CHUNK_SIZE)
+                if not data:
+                    raise ValueError("stream ended")
+                for part in parser.feed(data):
+                    if not part:
+                        continue
+                    with self._cond:
+                        self._frame = part
+                        self._frame_ts = time.time()
+                        self._seq += 1
+                        self._cond.notify_all()
+                    frames.inc()
+                with self._cond:
+                    if self._idle():
+                        return
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+class StreamLease:
+    """
+    A single session's hold on a shared :class:`MJPEGReader`.
+
+    Kept in session state while a viewer watches, so the reader stays open
+    between fragment reruns. The lease releases itself when it is garbage
+    collected, so a browser session that simply goes away still stops
+    counting as a viewer.
+    """
+    def __init__(self, reader):
+        reader.acquire()
+        self.reader = reader
+        self._finalizer = weakref.finalize(self, reader.release)
+
+    @property
+    def active(self):
+        return self._finalizer.alive
+
+    def release(self):
+        self._finalizer()
+
+
+def get_stream(host, port=DEFAULT_STREAM_PORT):
+    """Process-wide :class:`MJPEGReader` for ``host``, so viewers share one stream."""
+    url = stream_url(host, port)
+    reader = _readers.get(url)
+    if reader is None:
+        with _readers_lock:
+            reader = _readers.get(url)
+            if reader is None:
+                reader = _readers[url] = MJPEGReader(url)
+    return reader
@@ -1,172 +1,671 @@
 import time
+import random
+import threading
+from collections import deque
+import uuid
+import weakref
 import paho.mqtt.client as paho
 from paho import mqtt
+from nodes.metrics import registry
+from nodes.commands import commands, DEFAULT_FIELD, TELEMETRY_TOPICS
+from nodes.logging_setup import LazyPayload
 import os
 from dotenv import load_dotenv
 import logging
 
-# Konfigurasi logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Output ke console
-        logging.FileHandler('mqtt_client.log')  # Output ke file
-    ]
-)
+# Konfigurasi logging terpusat ada di nodes.logging_setup
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Parameter backoff reconnect
+FIRST_RECONNECT_DELAY = 1
+RECONNECT_RATE = 2
+MAX_RECONNECT_COUNT = 12
+MAX_RECONNECT_DELAY = 60
+# Jumlah maksimum pesan yang ditahan di memori selama koneksi putus
+MAX_PENDING_MESSAGES = 500
+# Batas waktu menunggu PUBACK dari broker (detik)
+DEFAULT_ACK_TIMEOUT = 10
+
+
+class ConnectionState:
+    """Visible state of the broker link."""
+    CONNECTING = "CONNECTING"
+    UP = "UP"
+    BACKOFF = "BACKOFF"
+    CLOSED = "CLOSED"
+
+
+class PublishHandle:
+    """
+    Future for a single publish.
+
+    Resolved from ``on_publish`` when the broker acknowledges the message
+    (PUBACK for QoS 1), or failed on error or once ``timeout`` seconds pass
+    after the message was handed to the socket. A message moved to the disk
+    spool is done but neither acked nor failed: replay delivers it later.
+    """
+    def __init__(self, topic, qos, timeout=DEFAULT_ACK_TIMEOUT):
+        self.topic = topic
+        self.qos = qos
+        self.timeout = timeout
+        self.created_at = time.monotonic()
+        self.deadline = self.created_at + timeout
+        self.sent_at = None
+        self.mid = None
+        self.queued = False
+        self.spooled = False
+        self.acked = False
+        self.error = None
+        self.latency = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until resolved; return True only if the broker acknowledged."""
+        if timeout is None:
+            timeout = max(0.0, self.deadline - time.monotonic())
+        self._done.wait(timeout)
+        return self.acked
+
+    def _mark_sent(self, mid):
+        self.mid = mid
+        self.sent_at = time.monotonic()
+        self.deadline = self.sent_at + self.timeout
+
+    def _resolve(self, acked_at):
+        self.latency = acked_at - self.sent_at
+        self.acked = True
+        self._done.set()
+
+    def _fail(self, error):
+        self.error = error
+        self._done.set()
+
+    def _spool(self):
+        self.queued = True
+        self.spooled = True
+        self._done.set()
+
+
 class MyMQTTClient:
-    def __init__(self, broker, port, username, password):
+    """
+    MQTT connection to the broker.
+
+    One instance is meant to be shared by every Streamlit session in the
+    process. Sessions hold it through an :class:`MQTTLease`; the network loop
+    is stopped once the last lease is released and started again on the
+    next :meth:`acquire`.
+
+    The network loop runs on its own thread and never sleeps for backoff.
+    Reconnects are scheduled on a separate thread with jittered exponential
+    backoff, and publishes made while the link is down are held in a bounded
+    queue that is flushed once the broker is reachable again.
+
+    Every publish is tracked until the broker acknowledges it; round-trip
+    times are kept as per-topic histograms in :data:`nodes.metrics.registry`.
+    """
+    def __init__(self, broker, port, username, password, client_id=None,
+                 max_pending=MAX_PENDING_MESSAGES, tls=True):
         self.broker = broker
         self.port = port
         self.username = username
         self.password = password
+        # TLS selalu dipakai ke broker produksi; dimatikan hanya untuk broker lokal (benchmark)
+        self.tls = tls
+        # Client ID harus unik per proses, broker memutus koneksi lama dengan ID yang sama
+        self.client_id = client_id or f"dashboard-{uuid.uuid4()}"
+        self._ref_lock = threading.Lock()
+        self._refs = 0
+        self._state = ConnectionState.CONNECTING
+        self._state_since = time.time()
+        self._pending = deque(maxlen=max_pending)
+        self._pending_lock = threading.Lock()
+        self.dropped_messages = 0
+        # mid -> PublishHandle untuk pesan yang menunggu PUBACK
+        self._inflight = {}
+        self._early_acks = {}
+        self._inflight_lock = threading.RLock()
+        self.reconnect_attempts = 0
+        # Percobaan reconnect beruntun sejak CONNACK sukses terakhir; menentukan jeda backoff
+        self._backoff_attempt = 0
+        self._stopped = threading.Event()
+        self._link_ready = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+        self.telemetry = None
+        self.spool = None
+        self._replayer = None
+        self._telemetry_topics = ()
+        self._telemetry_prefixes = ()
         self.client = self.connect_mqtt()
-        self.client.loop_start()
+        self._start_threads()
+        self._running = True
         self.timer = time.time()
         self.max_time = 5
 
+    # ---------------------------------------------------------------- state
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def is_connected(self):
+        return self._state == ConnectionState.UP
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def connection_info(self):
+        """Snapshot of the link state for display in the UI."""
+        return {
+            "state": self._state,
+            "since": self._state_since,
+            "pending": len(self._pending),
+            "dropped": self.dropped_messages,
+            "reconnect_attempts": self.reconnect_attempts,
+            "inflight": len(self._inflight),
+            "refs": self._refs,
+        }
+
+    def inflight_counts(self):
+        """Number of messages awaiting acknowledgement, per topic."""
+        with self._inflight_lock:
+            handles = list(self._inflight.values())
+        counts = {}
+        for handle in handles:
+            counts[handle.topic] = counts.get(handle.topic, 0) + 1
+        return counts
+
+    def latency_stats(self):
+        """Per-topic publish-to-PUBACK latency percentiles in seconds."""
+        return {labels["topic"]: hist.snapshot()
+                for _, labels, hist in registry.collect("mqtt_publish_ack_seconds")}
+
+    def _set_state(self, state):
+        if state != self._state:
+            logger.info("MQTT link state %s -> %s", self._state, state)
+            self._state = state
+            registry.gauge("mqtt_connected").set(1 if state == ConnectionState.UP else 0)
+            self._state_since = time.time()
+
+    # ------------------------------------------------------------ lifecycle
+    @property
+    def ref_count(self):
+        return self._refs
+
+    def acquire(self):
+        """Register one more user of the shared connection."""
+        with self._ref_lock:
+            self._refs += 1
+            if not self._running:
+                logger.info("Restarting shared MQTT connection (%s)", self.client_id)
+                self._stopped.clear()
+                self._set_state(ConnectionState.BACKOFF)
+                self._start_threads()
+                self._running = True
+                self._wake.set()
+            logger.debug("MQTT client acquired, refs=%d", self._refs)
+        return self
+
+    def release(self):
+        """Drop one user; the network loop stops when nobody is left."""
+        with self._ref_lock:
+            self._refs = max(0, self._refs - 1)
+            logger.debug("MQTT client released, refs=%d", self._refs)
+            if self._refs == 0 and self._running:
+                self._shutdown()
+
+    def _shutdown(self):
+        self._stopped.set()
+        self._set_state(ConnectionState.CLOSED)
+        try:
+            self.client.disconnect()
+        except Exception as e:
+            logger.error("Error stopping MQTT client: %s", e)
+        self._link_ready.set()
+        self._wake.set()
+        self._fail_inflight("connection closed")
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+        self._threads = []
+        self._running = False
+        logger.info("MQTT client disconnected and loop stopped")
+
+    def _start_threads(self):
+        self._threads = [
+            threading.Thread(target=self._network_loop, name="mqtt-network", daemon=True),
+            threading.Thread(target=self._reconnect_loop, name="mqtt-reconnect", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _network_loop(self):
+        """Drive paho's I/O. Idles while the reconnect thread owns the socket."""
+        while not self._stopped.is_set():
+            if not self._link_ready.wait(timeout=1.0):
+                continue
+            if self._stopped.is_set():
+                break
+            try:
+                rc = self.client.loop(timeout=1.0)
+            except Exception as e:
+                # Paket rusak dari broker tidak boleh mematikan thread jaringan
+                logger.error("MQTT network loop error: %s", e)
+                self._drop_socket()
+                rc = paho.MQTT_ERR_CONN_LOST
+            if rc != paho.MQTT_ERR_SUCCESS and self._link_ready.is_set():
+                # Socket mati tanpa on_disconnect (mis. error saat connect)
+                self._handle_link_lost(rc)
+
+    def _drop_socket(self):
+        try:
+            if self.client.socket() is not None:
+                self.client.socket().close()
+        except Exception:
+            pass
+
+    def _reconnect_loop(self):
+        """Reconnect scheduler and pending-queue flusher."""
+        while not self._stopped.is_set():
+            woke = self._wake.wait(timeout=1.0)
+            self._expire_inflight()
+            if not woke:
+                continue
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            if self._state == ConnectionState.UP:
+                self._flush_pending()
+                if self._replayer is not None:
+                    self._replayer.wake()
+                continue
+            if self._state != ConnectionState.BACKOFF:
+                continue
+            self._reconnect_with_backoff()
+
+    def _reconnect_with_backoff(self):
+        # Hitungan percobaan disimpan di instance: koneksi TCP yang berhasil tapi ditolak
+        # broker (CONNACK != 0) tidak boleh mengembalikan jeda ke awal
+        while not self._stopped.is_set():
+            attempt = self._backoff_attempt
+            delay = min(MAX_RECONNECT_DELAY, FIRST_RECONNECT_DELAY * RECONNECT_RATE ** attempt)
+            # Full jitter agar banyak klien tidak menyerbu broker bersamaan
+            delay = random.uniform(delay / 2, delay)
+            logger.info("Reconnecting in %.1f seconds...", delay)
+            if self._stopped.wait(delay):
+                return
+            self._set_state(ConnectionState.CONNECTING)
+            self.reconnect_attempts += 1
+            self._backoff_attempt = attempt + 1
+            if self._backoff_attempt == MAX_RECONNECT_COUNT:
+                logger.critical("Reconnect failed after %s attempts, still retrying every %ss",
+                                self._backoff_attempt, MAX_RECONNECT_DELAY)
+            try:
+                self.client.reconnect()
+                logger.info("Reconnect initiated, waiting for CONNACK")
+                self._link_ready.set()
+                return
+            except Exception as err:
+                logger.error("Reconnect failed: %s. Retrying...", err)
+                self._set_state(ConnectionState.BACKOFF)
+
+    def _handle_link_lost(self, rc):
+        self._link_ready.clear()
+        if self._stopped.is_set():
+            return
+        logger.warning("Disconnected with result code: %s", rc)
+        self._set_state(ConnectionState.BACKOFF)
+        self._wake.set()
+
     def connect_mqtt(self):
         def on_connect(client, userdata, flags, rc, properties=None):
             if rc == 0:
                 logger.info("Connected to MQTT broker with code %s", rc)
+                self._backoff_attempt = 0
+                self._set_state(ConnectionState.UP)
+                # Sesi broker bisa baru, jadi langganan telemetri dipasang ulang
+                if self._telemetry_topics:
+                    client.subscribe([(topic, 0) for topic in self._telemetry_topics])
+                # Flush antrian dilakukan di thread reconnect, bukan di thread jaringan
+                self._wake.set()
             else:
                 logger.error("CONNACK received with code %s", rc)
 
         def on_publish(client, userdata, mid, properties=None):
             logger.debug("Published message with mid: %s", mid)
+            self._on_ack(mid)
 
         def on_subscribe(client, userdata, mid, granted_qos, properties=None):
             logger.info("Subscribed: mid=%s, granted_qos=%s", mid, granted_qos)
 
         def on_message(client, userdata, msg):
-            logger.info("Received message: topic=%s, qos=%s, payload=%s", 
-                       msg.topic, msg.qos, msg.payload.decode())
+            if self.telemetry is not None and msg.topic.startswith(self._telemetry_prefixes):
+                with registry.timer("telemetry_ingest_seconds"):
+                    self.telemetry.ingest(msg.topic, msg.payload)
+                registry.counter("mqtt_messages_received_total", kind="telemetry").inc()
+                return
+            registry.counter("mqtt_messages_received_total", kind="other").inc()
+            # Payload baru di-decode bila log benar-benar ditulis, di thread logging
+            logger.info("Received message: topic=%s, qos=%s, payload=%s",
+                        msg.topic, msg.qos, LazyPayload(msg.payload))
 
         def on_disconnect(client, userdata, rc, properties=None):
-            FIRST_RECONNECT_DELAY = 1
-            RECONNECT_RATE = 2
-            MAX_RECONNECT_COUNT = 12
-            MAX_RECONNECT_DELAY = 60
-            logger.warning("Disconnected with result code: %s", rc)
-            reconnect_count, reconnect_delay = 0, FIRST_RECONNECT_DELAY
-            while reconnect_count < MAX_RECONNECT_COUNT:
-                logger.info("Reconnecting in %d seconds...", reconnect_delay)
-                time.sleep(reconnect_delay)
-
-                try:
-                    client.reconnect()
-                    logger.info("Reconnected successfully!")
-                    return
-                except Exception as err:
-                    logger.error("Reconnect failed: %s. Retrying...", err)
-
-                reconnect_delay *= RECONNECT_RATE
-                reconnect_delay = min(reconnect_delay, MAX_RECONNECT_DELAY)
-                reconnect_count += 1
-            logger.critical("Reconnect failed after %s attempts. Exiting...", reconnect_count)
-
-        client = paho.Client(client_id="dashboard", userdata=None, protocol=paho.MQTTv5)
+            # Jangan sleep di sini: callback berjalan di thread jaringan
+            self._handle_link_lost(rc)
+
+        client = paho.Client(client_id=self.client_id, userdata=None, protocol=paho.MQTTv5)
         client.on_connect = on_connect
 
         # Enable TLS for secure connection
-        client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+        if self.tls:
+            client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
         # Set username and password
-        client.username_pw_set(self.username, self.password)
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        # Setting callbacks
+        client.on_subscribe = on_subscribe
+        client.on_message = on_message
+        client.on_publish = on_publish
+        client.on_disconnect = on_disconnect
         # Connect to broker
         try:
             client.connect(self.broker, int(self.port))
             logger.info("Initiated connection to broker %s:%s", self.broker, self.port)
         except Exception as e:
+            # Broker mati saat start: jangan gagal di __init__ (cache_resource akan mencoba
+            # connect blocking di setiap rerun). Thread reconnect yang melanjutkan; publish diantrikan.
             logger.error("Failed to connect to broker: %s", e)
-            raise
-
-        # Setting callbacks
-        client.on_subscribe = on_subscribe
-        client.on_message = on_message
-        client.on_publish = on_publish
+            self._set_state(ConnectionState.BACKOFF)
+            self._wake.set()
+            return client
+        self._link_ready.set()
         return client
 
-    def publish_play_sound(self):
-        topic = "control/sawah1/mp3player/play"
-        payload = "{\"action\": \"play sound test\"}"
-        try:
-            result = self.client.publish(topic, payload, qos=1)
-            self.timer = time.time()
-            status = result[0]
-            if status == 0:
-                logger.info("Successfully published to %s", topic)
-                return {"success": True, "message": "Success play test sound"}
-            else:
-                logger.error("Failed to publish to %s, status: %s", topic, status)
-                return {"success": False, "message": "Failed to send message to topic " + topic}
-        except Exception as e:
-            logger.error("Error publishing to %s: %s", topic, e)
-            return {"success": False, "message": "Error publishing message"}
-        
-    def publish_stop_sound(self):
-        topic = "control/sawah1/mp3player/stop"
-        payload = "{\"action\": \"stop sound\"}"
-        try:
-            result = self.client.publish(topic, payload, qos=1)
-            status = result[0]
-            if status == 0:
-                logger.info("Successfully stopped sound")
-                return {"success": True, "message": "Success stop sound"}
-            else:
-                logger.error("Failed to publish to %s, status: %s", topic, status)
-                return {"success": False, "message": "Failed to send message to topic " + topic}
-        except Exception as e:
-            logger.error("Error publishing to %s: %s", topic, e)
-            return {"success": False, "message": "Error publishing message"}
+    # ----------------------------------------------------------- telemetry
+    def subscribe_telemetry(self, store, topics=TELEMETRY_TOPICS):
+        """
+        Feed device status/detection messages into ``store``.
+
+        Payloads are parsed on the network thread straight into the store's
+        ring buffers; subscriptions are renewed on every reconnect.
+        """
+        if self.telemetry is store and tuple(topics) == self._telemetry_topics:
+            return
+        self.telemetry = store
+        self._telemetry_topics = tuple(topics)
+        self._telemetry_prefixes = tuple(topic.split("+", 1)[0].split("#", 1)[0]
+                                         for topic in topics)
+        if self._state == ConnectionState.UP:
+            self.client.subscribe([(topic, 0) for topic in self._telemetry_topics])
+        logger.info("Subscribed telemetry topics: %s", ", ".join(self._telemetry_topics))
+
+    # ------------------------------------------------------------- publish
+    def publish_async(self, topic, payload, qos=1, timeout=DEFAULT_ACK_TIMEOUT):
+        """
+        Publish ``payload`` to ``topic`` and return a :class:`PublishHandle`.
+
+        While the link is down the message is held in a bounded in-memory
+        queue and sent when the connection comes back.
+        """
+        handle = PublishHandle(topic, qos, timeout)
+        if self._state != ConnectionState.UP:
+            self._enqueue(topic, payload, handle)
+            registry.counter("mqtt_publish_total", status="queued").inc()
+        else:
+            self._send(payload, handle)
+            registry.counter("mqtt_publish_total",
+                             status="failed" if handle.error is not None else "sent").inc()
+        return handle
+
+    def publish(self, topic, payload, qos=1, wait=None):
+        """
+        Publish and report the outcome as a dict.
 
-    def publish_set_default_sound(self, filenumber):
-        topic = "setting/sawah1/mp3player/default_filenumber"
-        payload = "{\"filenumber\":%d}" % filenumber
+        With ``wait`` set, block up to that many seconds for the broker's
+        acknowledgement so the UI can report real delivery.
+            :return: dict with ``success``, ``queued``, ``acked``, ``message`` and ``handle``
+        """
+        handle = self.publish_async(topic, payload, qos)
+        if wait and not handle.queued:
+            handle.wait(wait)
+        return self._handle_result(handle)
+
+    def _handle_result(self, handle):
+        result = {"success": handle.error is None, "queued": handle.queued,
+                  "acked": handle.acked, "handle": handle}
+        if handle.error is not None:
+            result["message"] = "Failed to send message to topic " + handle.topic
+        elif handle.spooled:
+            result["message"] = "Broker unreachable, message spooled to disk"
+        elif handle.queued:
+            result["message"] = "Broker unreachable, message queued"
+        else:
+            result["message"] = "Published to " + handle.topic
+        return result
+
+    def _send(self, payload, handle):
+        topic = handle.topic
         try:
-            result = self.client.publish(topic, payload, qos=1)
-            status = result[0]
-            if status == 0:
-                logger.info("Successfully set default sound to filenumber %d", filenumber)
-                return {"success": True, "message": "Success set default sound"}
-            else:
-                logger.error("Failed to publish to %s, status: %s", topic, status)
-                return {"success": False, "message": "Failed to send message to topic " + topic}
+            # publish() dipanggil di luar lock: thread jaringan paho memegang lock-nya sendiri
+            # saat memanggil on_publish -> _on_ack, jadi memegang keduanya bisa deadlock.
+            # PUBACK yang datang sebelum mid terdaftar ditampung di _early_acks.
+            info = self.client.publish(topic, payload, qos=handle.qos)
+            status = info.rc
+            with self._inflight_lock:
+                if status == paho.MQTT_ERR_SUCCESS or (status == paho.MQTT_ERR_NO_CONN and handle.qos > 0):
+                    handle._mark_sent(info.mid)
+                    acked_at = self._early_acks.pop(info.mid, None)
+                    if acked_at is not None:
+                        self._complete(handle, acked_at)
+                    else:
+                        self._inflight[info.mid] = handle
+                        registry.gauge("mqtt_publish_inflight").inc()
         except Exception as e:
             logger.error("Error publishing to %s: %s", topic, e)
-            return {"success": False, "message": "Error publishing message"}
+            handle._fail(str(e))
+            return
+        if status == paho.MQTT_ERR_NO_CONN and handle.qos > 0:
+            # Link baru saja putus; paho menyimpan pesan QoS>0 dan mengirim ulang setelah reconnect
+            logger.warning("Link lost while publishing to %s, paho will resend", topic)
+            handle.queued = True
+        elif status != paho.MQTT_ERR_SUCCESS:
+            logger.error("Failed to publish to %s, status: %s", topic, status)
+            handle._fail(status)
+
+    def _on_ack(self, mid):
+        acked_at = time.monotonic()
+        with self._inflight_lock:
+            handle = self._inflight.pop(mid, None)
+            if handle is None:
+                # PUBACK/QoS 0 write finished before publish() returned the mid
+                self._early_acks[mid] = acked_at
+                return
+            registry.gauge("mqtt_publish_inflight").dec()
+        self._complete(handle, acked_at)
+
+    def _complete(self, handle, acked_at):
+        handle._resolve(acked_at)
+        registry.histogram("mqtt_publish_ack_seconds", topic=handle.topic).observe(handle.latency)
 
-    def publish_set_volume_speaker(self, volume):
-        topic = "control/sawah1/mp3player/set_volume"
-        payload = "{\"value\":%d}" % volume
+    def _expire_inflight(self):
+        now = time.monotonic()
+        expired = []
+        with self._inflight_lock:
+            for mid, handle in list(self._inflight.items()):
+                if now > handle.deadline:
+                    del self._inflight[mid]
+                    expired.append(handle)
+            for mid, acked_at in list(self._early_acks.items()):
+                if now - acked_at > DEFAULT_ACK_TIMEOUT:
+                    del self._early_acks[mid]
+        for handle in expired:
+            registry.gauge("mqtt_publish_inflight").dec()
+            registry.counter("mqtt_publish_timeouts_total", topic=handle.topic).inc()
+            logger.warning("No acknowledgement for mid %s on %s after %ss",
+                           handle.mid, handle.topic, handle.timeout)
+            handle._fail("timeout")
+
+    def _fail_inflight(self, reason):
+        with self._inflight_lock:
+            handles = list(self._inflight.values())
+            self._inflight.clear()
+        registry.gauge("mqtt_publish_inflight").dec(len(handles))
+        for handle in handles:
+            handle._fail(reason)
+
+    def _enqueue(self, topic, payload, handle):
+        handle.queued = True
+        with self._pending_lock:
+            if len(self._pending) == self._pending.maxlen:
+                dropped = self._pending.popleft()
+                if self.spool is not None:
+                    self._spill([dropped])
+                else:
+                    self.dropped_messages += 1
+                    dropped[2]._fail("dropped")
+                    logger.warning("Pending queue full, dropping oldest message for %s", dropped[0])
+            self._pending.append((topic, payload, handle))
+        logger.info("Link %s, queued message for %s (%d pending)",
+                    self._state, topic, len(self._pending))
+
+    def _flush_pending(self):
+        if self.spool is not None and self.spool.count("mqtt"):
+            # Pesan lama ada di spool; antrian memori ikut ke spool supaya urutan tetap terjaga
+            with self._pending_lock:
+                messages = list(self._pending)
+                self._pending.clear()
+            self._spill(messages)
+            if self._replayer is not None:
+                self._replayer.wake()
+            return
+        flushed = 0
+        while self._state == ConnectionState.UP:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+                topic, payload, handle = self._pending.popleft()
+            self._send(payload, handle)
+            flushed += 1
+        if flushed:
+            logger.info("Flushed %d queued messages", flushed)
+
+    # --------------------------------------------------------------- spool
+    def attach_spool(self, spool, replayer=None):
+        """
+        Spill messages that overflow the in-memory queue to ``spool``.
+
+        Spooled messages (sink ``"mqtt"``) are sent again through
+        :meth:`replay`, which ``replayer`` is woken to run on reconnect.
+        """
+        self.spool = spool
+        self._replayer = replayer
+
+    def _spill(self, messages):
+        if not messages:
+            return
+        self.spool.put_many("mqtt", [
+            {"topic": topic,
+             "payload": payload.decode() if isinstance(payload, bytes) else payload,
+             "qos": handle.qos}
+            for topic, payload, handle in messages
+        ])
+        for _, _, handle in messages:
+            handle._spool()
+        logger.info("Spooled %d MQTT messages to disk", len(messages))
+
+    def replay(self, payloads):
+        """
+        Spool sink: publish spooled messages and wait for their acknowledgements.
+
+        Messages go straight to the socket, never through the in-memory
+        queue: if the link drops mid-batch the rest stay in the spool only,
+        instead of being queued in RAM and spilled to the spool a second time.
+        """
+        handles = []
+        for p in payloads:
+            if self._state != ConnectionState.UP:
+                break
+            handle = PublishHandle(p["topic"], p.get("qos", 1))
+            self._send(p["payload"], handle)
+            handles.append(handle)
+        registry.counter("mqtt_publish_total", status="replayed").inc(len(handles))
+        if len(handles) < len(payloads):
+            return False
+        deadline = time.monotonic() + DEFAULT_ACK_TIMEOUT
+        for handle in handles:
+            handle.wait(max(0.0, deadline - time.monotonic()))
+        return all(handle.acked or handle.qos == 0 for handle in handles)
+
+    # ------------------------------------------------------------ commands
+    def send_command(self, name, field=DEFAULT_FIELD, wait=None, **params):
+        """
+        Dispatch a registered command (see :mod:`nodes.commands`) to one field.
+            :return: same dict as :meth:`publish`, with the command's success message
+        """
+        command = commands.get(name)
         try:
-            result = self.client.publish(topic, payload, qos=1)
-            status = result[0]
-            if status == 0:
-                logger.info("Successfully set volume to %d", volume)
-                return {"success": True, "message": "Success set volume speaker"}
-            else:
-                logger.error("Failed to publish to %s, status: %s", topic, status)
-                return {"success": False, "message": "Failed to send message to topic " + topic}
-        except Exception as e:
-            logger.error("Error publishing to %s: %s", topic, e)
-            return {"success": False, "message": "Error publishing message"}
+            payload = command.encode(**params)
+        except ValueError as e:
+            logger.error("Invalid parameters for %s: %s", name, e)
+            return {"success": False, "queued": False, "acked": False, "message": str(e)}
+        result = self.publish(command.topic(field), payload, qos=command.qos, wait=wait)
+        self.timer = time.time()
+        if result["success"]:
+            logger.info("Successfully sent %s to %s", name, field)
+            if not result["queued"]:
+                result["message"] = command.description
+        return result
+
+    def fan_out(self, name, fields, wait=None, **params):
+        """
+        Send one command to many fields in a single publish pass.
 
-    def publish_play_sound_file(self, filenumber):
-        topic = "control/sawah1/mp3player/play"
-        payload = "{\"action\": \"play sound file\", \"filenumber\":%d}" % filenumber
+        The payload is encoded once and every message is handed to paho
+        before waiting on any acknowledgement.
+            :return: dict with overall ``success`` and per-field ``results``
+        """
+        command = commands.get(name)
         try:
-            result = self.client.publish(topic, payload, qos=1)
-            status = result[0]
-            if status == 0:
-                logger.info("Successfully played sound file %d", filenumber)
-                return {"success": True, "message": "Success play sound with file number " + str(filenumber)}
-            else:
-                logger.error("Failed to publish to %s, status: %s", topic, status)
-                return {"success": False, "message": "Failed to send message to topic " + topic}
-        except Exception as e:
-            logger.error("Error publishing to %s: %s", topic, e)
-            return {"success": False, "message": "Error publishing message"}
\ No newline at end of file
+            payload = command.encode(**params)
+        except ValueError as e:
+            logger.error("Invalid parameters for %s: %s", name, e)
+            return {"success": False, "message": str(e), "results": {}}
+        handles = {field: self.publish_async(command.topic(field), payload, command.qos)
+                   for field in fields}
+        if wait:
+            deadline = time.monotonic() + wait
+            for handle in handles.values():
+                if not handle.queued:
+                    handle.wait(max(0.0, deadline - time.monotonic()))
+        results = {field: self._handle_result(handle) for field, handle in handles.items()}
+        failed = [field for field, result in results.items() if not result["success"]]
+        logger.info("Sent %s to %d fields (%d failed)", name, len(results), len(failed))
+        return {
+            "success": not failed,
+            "message": command.description if not failed else "Failed for " + ", ".join(failed),
+            "results": results,
+        }
+
+class MQTTLease:
+    """
+    A single session's hold on a shared :class:`MyMQTTClient`.
+
+    The lease releases itself when it is garbage collected, so a browser
+    session that simply goes away still gives its reference back.
+    """
+    def __init__(self, mqtt_client):
+        self.client = mqtt_client.acquire()
+        self._finalizer = weakref.finalize(self, mqtt_client.release)
+
+    @property
+    def active(self):
+        return self._finalizer.alive
+
+    def release(self):
+        self._finalizer()
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from nodes.metrics import registry
+from nodes.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FETCH_WORKERS = 16
+DEFAULT_VISION_CONCURRENCY = 4
+# Permintaan per detik ke API vision, untuk seluruh proses
+DEFAULT_VISION_RATE = 1.0
+DEFAULT_DEADLINE = 90
+
+
+class AnalysisResult:
+    """Latest analysis state of one camera."""
+    def __init__(self, camera_ip, status="queued"):
+        self.camera_ip = camera_ip
+        self.status = status
+        self.text = ""
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def duration(self):
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        return {
+            "camera": self.camera_ip,
+            "status": self.status,
+            "started": self.started,
+            "duration": round(self.duration, 2),
+            "error": self.error,
+        }
+
+
+class ResultStore:
+    """Thread-safe map of camera -> latest :class:`AnalysisResult`, read by the UI."""
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def set(self, result):
+        with self._lock:
+            self._results[result.camera_ip] = result
+
+    def get(self, camera_ip):
+        return self._results.get(camera_ip)
+
+    def all(self):
+        with self._lock:
+            return sorted(self._results.values(), key=lambda r: r.camera_ip)
+
+
+class AnalysisScheduler:
+    """
+    Runs rice plant analyses across many cameras.
+
+    Each camera goes through two stages. The frame fetch runs on a wide
+    thread pool, since ESP32 captures are slow but cheap for the server.
+    The vision request runs on a pool of ``vision_concurrency`` threads
+    behind a process-wide token bucket. Every camera has a deadline that
+    covers both stages, so a sweep takes about as long as the slowest
+    camera rather than the sum of all of them.
+    """
+    def __init__(self, analyzer, store=None, fetch_workers=DEFAULT_FETCH_WORKERS,
+                 vision_concurrency=DEFAULT_VISION_CONCURRENCY, vision_rate=DEFAULT_VISION_RATE,
+                 deadline=DEFAULT_DEADLINE):
+        self.analyzer = analyzer
+        self.store = store or ResultStore()
+        self.deadline = deadline
+        self._fetch_pool = ThreadPoolExecutor(fetch_workers, thread_name_prefix="camera-fetch")
+        self._vision_pool = ThreadPoolExecutor(vision_concurrency, thread_name_prefix="vision")
+        self._limiter = TokenBucket(vision_rate, burst=vision_concurrency)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._periodic = None
+        self._stop = threading.Event()
+
+    def sweep(self, cameras, deadline=None):
+        """Queue an analysis for every camera not already in progress; returns at once."""
+        deadline = deadline or self.deadline
+        queued = []
+        for camera_ip in cameras:
+            with self._lock:
+                if camera_ip in self._active:
+                    continue
+                self._active.add(camera_ip)
+            result = AnalysisResult(camera_ip)
+            self.store.set(result)
+            self._fetch_pool.submit(self._fetch, result, time.monotonic() + deadline)
+            queued.append(camera_ip)
+        if queued:
+            logger.info("Queued analysis for %d cameras.", len(queued))
+        return queued
+
+    def start_periodic(self, cameras, interval):
+        """Sweep ``cameras`` (a list or a callable returning one) every ``interval`` seconds."""
+        if self._periodic is not None and self._periodic.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.sweep(cameras() if callable(cameras) else cameras)
+                except Exception as e:
+                    logger.error("Periodic sweep failed: %s", e)
+                self._stop.wait(interval)
+
+        self._periodic = threading.Thread(target=run, name="analysis-periodic", daemon=True)
+        self._periodic.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _finish(self, result, status, error=None):
+        result.status = status
+        result.error = error
+        result.finished = time.time()
+        with self._lock:
+            self._active.discard(result.camera_ip)
+        registry.histogram("analysis_seconds", status=status).observe(result.duration)
+        if status != "ok":
+            logger.warning("Analysis of %s ended with %s: %s", result.camera_ip, status, error)
+
+    def _fetch(self, result, deadline):
+        result.status = "fetching"
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("deadline passed before fetching")
+            jpeg = self.analyzer.capture(result.camera_ip, deadline=remaining)
+        except Exception as e:
+            self._finish(result, "error", str(e))
+            return
+        if time.monotonic() >= deadline:
+            self._finish(result, "timeout", "deadline passed while fetching")
+            return
+        result.status = "waiting"
+        self._vision_pool.submit(self._analyze, result, jpeg, deadline)
+
+    def _analyze(self, result, jpeg, deadline):
+        if not self._limiter.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._finish(result, "timeout", "deadline passed waiting for the vision API")
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._finish(result, "timeout", "deadline passed waiting for the vision API")
+            return
+        result.status = "analyzing"
+        # Sisa deadline juga membatasi permintaan API itu sendiri, bukan hanya jeda antar chunk
+        stream = self.analyzer.infer_plant_condition(image=jpeg, timeout=remaining)
+        parts = []
+        try:
+            for chunk in stream:
+                parts.append(chunk)
+                if time.monotonic() >= deadline:
+                    result.text = "".join(parts)
+                    self._finish(result, "timeout", "deadline passed while streaming")
+                    return
+        except Exception as e:
+            # Timeout permintaan API karena deadline habis dicatat sebagai timeout, bukan error
+            self._finish(result, "timeout" if time.monotonic() >= deadline else "error", str(e))
+            return
+        finally:
+            stream.close()
+        result.text = "".join(parts)
+        self._finish(result, "ok")
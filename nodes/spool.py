@@ -0,0 +1,161 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from nodes.metrics import registry
+from nodes.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_SPOOL_ROWS = 100000
+REPLAY_BATCH = 50
+REPLAY_RATE = 20.0
+MAX_REPLAY_DELAY = 60
+
+
+class Spool:
+    """
+    Durable FIFO of writes that could not be delivered yet.
+
+    Backed by SQLite in WAL mode with ``synchronous=NORMAL``: a commit is
+    an append to the write-ahead log and fsync only happens at checkpoints,
+    so bursts of writes are flushed to disk together. The table is capped
+    at ``max_rows``; past that the oldest rows are dropped.
+    """
+    def __init__(self, path, max_rows=MAX_SPOOL_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sink TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spool_sink ON spool (sink, id)")
+
+    def put(self, sink, payload):
+        self.put_many(sink, [payload])
+
+    def put_many(self, sink, payloads):
+        now = time.time()
+        rows = [(sink, json.dumps(p), now) for p in payloads]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO spool (sink, payload, created) VALUES (?, ?, ?)", rows)
+            overflow = self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0] - self.max_rows
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM spool WHERE id IN (SELECT id FROM spool ORDER BY id LIMIT ?)",
+                    (overflow,))
+            self._conn.execute("COMMIT")
+        registry.counter("spool_writes_total", sink=sink).inc(len(rows))
+        if overflow > 0:
+            registry.counter("spool_dropped_total").inc(overflow)
+            logger.warning("Spool full, dropped %d oldest entries", overflow)
+
+    def peek(self, sink, limit=REPLAY_BATCH):
+        """Oldest ``limit`` entries for ``sink`` as ``[(id, payload)]``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM spool WHERE sink = ? ORDER BY id LIMIT ?",
+                (sink, limit)).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+
+    def mark_failed(self, ids):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE spool SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+
+    def count(self, sink=None):
+        with self._lock:
+            if sink is None:
+                return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM spool WHERE sink = ?", (sink,)).fetchone()[0]
+
+    def sinks(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT sink FROM spool")]
+
+
+class SpoolReplayer:
+    """
+    Background worker that drains a :class:`Spool` into registered sinks.
+
+    A sink handler takes a list of payloads and returns True once they are
+    delivered; on False the batch stays spooled and that sink backs off
+    exponentially. Deliveries across all sinks share one token bucket so a
+    reconnect does not flood the network with the backlog.
+    """
+    def __init__(self, spool, rate=REPLAY_RATE, batch_size=REPLAY_BATCH):
+        self.spool = spool
+        self.batch_size = batch_size
+        self.limiter = TokenBucket(rate, burst=batch_size)
+        self._handlers = {}
+        self._retry_at = {}
+        self._delay = {}
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self._thread.start()
+
+    def register_sink(self, sink, handler):
+        self._handlers[sink] = handler
+        self.wake()
+
+    def wake(self):
+        """Retry every sink now, e.g. after a reconnect."""
+        self._retry_at.clear()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=5.0)
+            self._wake.clear()
+            busy = True
+            while busy:
+                busy = False
+                for sink, handler in list(self._handlers.items()):
+                    if time.monotonic() < self._retry_at.get(sink, 0):
+                        continue
+                    if self._replay_batch(sink, handler):
+                        busy = True
+
+    def _replay_batch(self, sink, handler):
+        batch = self.spool.peek(sink, self.batch_size)
+        if not batch:
+            return False
+        self.limiter.acquire(len(batch))
+        ids = [row_id for row_id, _ in batch]
+        try:
+            delivered = handler([payload for _, payload in batch])
+        except Exception as e:
+            logger.error("Spool replay to %s failed: %s", sink, e)
+            delivered = False
+        if delivered:
+            self.spool.ack(ids)
+            self._delay.pop(sink, None)
+            registry.counter("spool_replayed_total", sink=sink).inc(len(ids))
+            logger.info("Replayed %d spooled entries to %s", len(ids), sink)
+            return True
+        self.spool.mark_failed(ids)
+        delay = min(MAX_REPLAY_DELAY, self._delay.get(sink, 0.5) * 2)
+        self._delay[sink] = delay
+        self._retry_at[sink] = time.monotonic() + delay
+        logger.warning("Sink %s unavailable, retrying spool replay in %.0fs", sink, delay)
+        return False
@@ -0,0 +1,168 @@
+import json
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 4096
+MAX_METRICS = 10000
+# Timestamp device di atas ini dianggap milidetik (1e11 detik baru tercapai tahun 5138)
+MILLIS_THRESHOLD = 1e11
+# Jam device yang meleset lebih dari ini dari jam server (mis. uptime) diganti waktu terima
+MAX_CLOCK_SKEW = 86400
+
+
+def device_time(value, received=None):
+    """
+    Epoch seconds for a device-supplied ``ts``, or ``received`` when it can't be trusted.
+
+    ESP32 firmware sends milliseconds, seconds since boot or nothing at
+    all; anything that is not within ``MAX_CLOCK_SKEW`` of the server clock
+    after the millisecond conversion falls back to the receive time.
+    """
+    if received is None:
+        received = time.time()
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return received
+    if value > MILLIS_THRESHOLD:
+        value = value / 1000.0
+    if abs(value - received) > MAX_CLOCK_SKEW:
+        return received
+    return float(value)
+
+
+class RingBuffer:
+    """
+    Fixed-size ring of ``(timestamp, value)`` samples backed by NumPy.
+
+    Meant for exactly one writer thread (the MQTT network loop) and any
+    number of readers, without locks. Every sample is written twice, at
+    ``i`` and ``i + capacity``, so the most recent ``n`` samples are always
+    one contiguous slice and a snapshot is a view, not a copy. The write
+    counter is bumped only after both copies are stored.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._ts = np.zeros(2 * capacity, dtype=np.float64)
+        self._values = np.zeros(2 * capacity, dtype=np.float64)
+        self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    def append(self, ts, value):
+        i = self._written % self.capacity
+        j = i + self.capacity
+        self._ts[i] = self._ts[j] = ts
+        self._values[i] = self._values[j] = value
+        self._written += 1
+
+    def latest(self):
+        written = self._written
+        if not written:
+            return None, None
+        i = (written - 1) % self.capacity
+        return self._ts[i], self._values[i]
+
+    def snapshot(self, last=None):
+        """
+        Return ``(timestamps, values)`` as read-only views, oldest first.
+
+        The views alias the ring: if the writer laps the reader, the oldest
+        entries may already hold newer data. Copy them if they need to
+        outlive the current rerun.
+        """
+        written = self._written
+        size = min(written, self.capacity)
+        if last is not None:
+            size = min(size, last)
+        start = (written - size) % self.capacity
+        ts = self._ts[start:start + size]
+        values = self._values[start:start + size]
+        ts.flags.writeable = False
+        values.flags.writeable = False
+        return ts, values
+
+
+class TelemetryStore:
+    """
+    Ring buffers per metric, filled from device status and detection topics.
+
+    A metric is ``<field>/<device>/<key>`` for every numeric key in a JSON
+    payload published to ``status/<field>/<device>`` or
+    ``detection/<field>/<device>``. The last decoded payload per device is
+    kept as well, for status panels, together with the time each device
+    last reported anything (receive time, not the device clock).
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_metrics=MAX_METRICS):
+        self.capacity = capacity
+        self.max_metrics = max_metrics
+        self._buffers = {}
+        self._listeners = []
+        self.latest_status = {}
+        self.last_seen = {}
+        self.messages = 0
+        self.rejected = 0
+
+    def ingest(self, topic, payload, ts=None):
+        """Parse one message. Runs on the network thread; never raises."""
+        try:
+            kind, field, device = topic.split("/", 2)
+            data = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            self.rejected += 1
+            return False
+        if not isinstance(data, dict):
+            self.rejected += 1
+            return False
+        received = time.time()
+        if ts is None:
+            ts = device_time(data.get("ts"), received)
+        prefix = f"{field}/{device}/"
+        for key, value in data.items():
+            if key == "ts" or not isinstance(value, (int, float)):
+                continue
+            buffer = self._buffers.get(prefix + key)
+            if buffer is None:
+                buffer = self._new_buffer(prefix + key)
+                if buffer is None:
+                    continue
+            buffer.append(ts, value)
+        key = f"{field}/{device}"
+        self.last_seen[key] = received
+        if kind == "status":
+            self.latest_status[key] = data
+        for listener in self._listeners:
+            try:
+                listener(kind, field, device, data, ts)
+            except Exception as e:
+                logger.error("Telemetry listener failed for %s: %s", topic, e)
+        self.messages += 1
+        return True
+
+    def add_listener(self, callback):
+        """Call ``callback(kind, field, device, data, ts)`` for every parsed message."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _new_buffer(self, metric):
+        if len(self._buffers) >= self.max_metrics:
+            self.rejected += 1
+            logger.warning("Telemetry metric limit reached, ignoring %s", metric)
+            return None
+        buffer = self._buffers[metric] = RingBuffer(self.capacity)
+        return buffer
+
+    def metrics(self):
+        return sorted(list(self._buffers))
+
+    def snapshot(self, metric, last=None):
+        buffer = self._buffers.get(metric)
+        if buffer is None:
+            return np.empty(0), np.empty(0)
+        return buffer.snapshot(last)
+
+    def latest(self, metric):
+        buffer = self._buffers.get(metric)
+        return buffer.latest() if buffer is not None else (None, None)
@@ -1,29 +1,55 @@
 import requests
 import json
 import logging
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from nodes.metrics import registry
 
 
-# Konfigurasi logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # Output ke console
-        logging.FileHandler('ubidots_client.log')  # Output ke file
-    ]
-)
-
+# Konfigurasi logging terpusat ada di nodes.logging_setup
 logger = logging.getLogger(__name__)
 
+BASE_URL = "https://industrial.api.ubidots.com"
+# (connect, read) timeout untuk request ke Ubidots
+DEFAULT_TIMEOUT = (3.05, 10)
+# Interval pengiriman batch dan jendela penggabungan nilai untuk variabel yang sama
+FLUSH_INTERVAL = 1.0
+COALESCE_WINDOW = 1.0
+# Status HTTP yang layak dicoba ulang dari spool (token salah, rate limit, server error)
+RETRY_STATUS = {401, 403, 408, 429}
+
+
 class ubidots():
-    def __init__(self, token, device_label):
+    def __init__(self, token, device_label, timeout=DEFAULT_TIMEOUT,
+                 flush_interval=FLUSH_INTERVAL, coalesce_window=COALESCE_WINDOW,
+                 base_url=BASE_URL):
         self.token = token
         self.device_label = device_label
-        self.url = f"https://industrial.api.ubidots.com/api/v1.6/devices/{self.device_label}"
+        self.url = f"{base_url}/api/v1.6/devices/{self.device_label}"
         self.headers = {
             "X-Auth-Token": self.token,
             "Content-Type": "application/json"
         }
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.coalesce_window = coalesce_window
+        # Satu session keep-alive untuk semua request
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pending = {}
+        self._sending = False
+        self._cond = threading.Condition()
+        self._worker = None
+        self.spool = None
+
+    def attach_spool(self, spool):
+        """Keep batches that fail to upload in ``spool`` (sink ``"ubidots"``)."""
+        self.spool = spool
+
     def send_data(self, dict_value):
         """
         Send data to Ubidots.
@@ -31,10 +57,100 @@ class ubidots():
             :return: Response from the Ubidots API
         """
         try:
-            response = requests.post(self.url, headers=self.headers, json=dict_value)
+            with registry.timer("ubidots_post_seconds"):
+                response = self.session.post(self.url, json=dict_value, timeout=self.timeout)
             response.raise_for_status()  # Raise an error for bad responses
             logger.info("Data sent successfully: %s", response.json())
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error("Error sending data to Ubidots: %s", e)
-            return None
\ No newline at end of file
+            return None
+
+    def _post(self, payload):
+        """POST ``payload``; True if delivered or not worth retrying."""
+        # Termasuk replay dari spool, bukan hanya batch dari worker
+        try:
+            with registry.timer("ubidots_post_seconds"):
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error sending data to Ubidots: %s", e)
+            registry.counter("ubidots_post_errors_total", reason="network").inc()
+            return False
+        if response.status_code in RETRY_STATUS or response.status_code >= 500:
+            logger.error("Ubidots rejected upload with %s, will retry", response.status_code)
+            registry.counter("ubidots_post_errors_total", reason=str(response.status_code)).inc()
+            return False
+        if not response.ok:
+            registry.counter("ubidots_post_errors_total", reason=str(response.status_code)).inc()
+            logger.error("Ubidots rejected upload with %s, dropping: %s",
+                         response.status_code, response.text[:200])
+            return True
+        logger.info("Data sent successfully: %s", response.status_code)
+        return True
+
+    def replay(self, payloads):
+        """Spool sink: merge spooled batches into one multi-timestamp POST."""
+        merged = {}
+        for payload in payloads:
+            for variable, dots in payload.items():
+                merged.setdefault(variable, []).extend(dots if isinstance(dots, list) else [dots])
+        return self._post(merged)
+
+    def send_data_async(self, dict_value, timestamp=None):
+        """
+        Queue variables for the background uploader and return immediately.
+
+        Writes to the same variable within ``coalesce_window`` seconds keep
+        only the latest value. Everything queued during one
+        ``flush_interval`` goes out as a single multi-variable,
+        multi-timestamp POST.
+            :param dict_value: ``{variable: value}``
+            :param timestamp: epoch seconds of the values, default now
+        """
+        ts_ms = int((timestamp or time.time()) * 1000)
+        window_ms = self.coalesce_window * 1000
+        with self._cond:
+            for variable, value in dict_value.items():
+                dot = dict(value) if isinstance(value, dict) else {"value": value}
+                dot.setdefault("timestamp", ts_ms)
+                dots = self._pending.setdefault(variable, [])
+                if dots and dot["timestamp"] - dots[-1]["timestamp"] < window_ms:
+                    dots[-1] = dot
+                    registry.counter("ubidots_writes_coalesced_total").inc()
+                else:
+                    dots.append(dot)
+            registry.counter("ubidots_writes_total").inc(len(dict_value))
+            self._ensure_worker()
+            self._cond.notify()
+
+    def flush(self, timeout=5.0):
+        """Wait until the background uploader has nothing left to send."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while (self._pending or self._sending) and time.monotonic() < deadline:
+                self._cond.notify()
+                self._cond.wait(0.05)
+            return not (self._pending or self._sending)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="ubidots-uploader", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Tunggu sebentar agar perubahan beruntun (mis. slider) tergabung
+            time.sleep(self.flush_interval)
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._sending = True
+            payload = {var: dots[0] if len(dots) == 1 else dots for var, dots in batch.items()}
+            registry.counter("ubidots_posts_total").inc()
+            if not self._post(payload) and self.spool is not None:
+                self.spool.put("ubidots", payload)
+            with self._cond:
+                self._sending = False
+                self._cond.notify_all()
@@ -0,0 +1,29 @@
+import io
+import streamlit as st
+from matplotlib.figure import Figure
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def render_bar_chart(version, _labels, _values, _colors=None, title="", ylabel=""):
+    """
+    Render a bar chart to PNG bytes, cached on ``version``.
+
+    Only ``version`` and the text arguments are part of the cache key; the
+    data itself is skipped when hashing (underscore prefix), so callers must
+    bump ``version`` whenever the data changes. A plain ``Figure`` is used
+    instead of ``pyplot`` so nothing lands in pyplot's global figure list,
+    and it is cleared right after rasterizing.
+    """
+    fig = Figure(figsize=(6.4, 4.8))
+    try:
+        ax = fig.subplots()
+        ax.bar(_labels, _values, color=_colors)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.tick_params(axis="x", labelsize=8)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=100)
+        return buf.getvalue()
+    finally:
+        fig.clear()
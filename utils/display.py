@@ -1,57 +1,71 @@
+import html
 import streamlit as st
-import pandas as pd
 
-def display_dict_to_ui(data_dict, title="Dictionary Data", expandable=True):
+# Styling untuk tampilan
+_STYLE = """
+<style>
+.dict-container {
+    background-color: #f8f9fa;
+    padding: 20px;
+    border-radius: 10px;
+    margin-bottom: 20px;
+}
+.dict-key {
+    font-weight: bold;
+    color: #2c3e50;
+}
+.dict-value {
+    color: #34495e;
+}
+</style>
+"""
+# Key per elemen markdown pada mode incremental. 100 kartu (>10 KB) melewati batas cache
+# pesan Streamlit (global.minCachedMessageSize, 10 KB), jadi grup yang isinya tidak berubah
+# dikirim ulang ke browser hanya sebagai hash, bukan isi lengkap
+INCREMENTAL_GROUP_SIZE = 100
+
+
+def _cards(items):
+    """Card markup for ``(key, value)`` pairs, escaped, as one string."""
+    return "".join(
+        "<div class='dict-container'>"
+        f"<span class='dict-key'>{html.escape(str(key))}</span>: "
+        f"<span class='dict-value'>{html.escape(str(value))}</span>"
+        "</div>"
+        for key, value in items
+    )
+
+def display_dict_to_ui(data_dict, title="Dictionary Data", expandable=True, incremental=False):
     """
     Menampilkan dictionary sebagai UI Streamlit yang estetis
-    
+
+    Semua key dirender sebagai satu elemen markdown (style ikut di dalamnya),
+    jadi dict dengan ratusan key tetap hanya satu update di frontend.
+
     Parameters:
     - data_dict: Dictionary yang akan ditampilkan
     - title: Judul untuk section UI
     - expandable: Jika True, tampilan dalam expander
+    - incremental: Untuk panel yang di-refresh berulang: key dibagi per
+      INCREMENTAL_GROUP_SIZE ke elemen terpisah, sehingga pada refresh hanya
+      grup dengan key yang berubah yang dikirim ulang isinya
     """
-    
-    # Styling untuk tampilan
-    st.markdown("""
-    <style>
-    .dict-container {
-        background-color: #f8f9fa;
-        padding: 20px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-    }
-    .dict-key {
-        font-weight: bold;
-        color: #2c3e50;
-    }
-    .dict-value {
-        color: #34495e;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
     # Container utama
     if expandable:
         with st.expander(title, expanded=True):
-            _render_dict(data_dict)
+            _render_dict(data_dict, incremental)
     else:
         st.subheader(title)
-        _render_dict(data_dict)
+        _render_dict(data_dict, incremental)
 
-def _render_dict(data_dict):
+def _render_dict(data_dict, incremental=False):
     """Helper function untuk render dictionary"""
-    with st.container():
-        # Konversi dict ke dataframe untuk tampilan tabel
-        df = pd.DataFrame(list(data_dict.items()), columns=['Key', 'Value'])
-        
-        # Tampilkan dalam format card-like
-        for idx, row in df.iterrows():
-            st.markdown(
-                f"""
-                <div class='dict-container'>
-                    <span class='dict-key'>{row['Key']}</span>: 
-                    <span class='dict-value'>{row['Value']}</span>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
\ No newline at end of file
+    if not incremental:
+        st.markdown(_STYLE + _cards(data_dict.items()), unsafe_allow_html=True)
+        return
+    # Style dipisah agar isi grup pertama tetap identik antar refresh
+    st.markdown(_STYLE, unsafe_allow_html=True)
+    items = list(data_dict.items())
+    for start in range(0, len(items), INCREMENTAL_GROUP_SIZE):
+        st.markdown(_cards(items[start:start + INCREMENTAL_GROUP_SIZE]), unsafe_allow_html=True)
+
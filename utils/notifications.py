@@ -0,0 +1,42 @@
+import time
+import streamlit as st
+
+def display_notification(placeholder, notification_key):
+    if notification_key in st.session_state:
+        message, msg_type, timestamp = st.session_state[notification_key]
+        if time.time() - timestamp < 3:
+            if msg_type == "success":
+                placeholder.success(message)
+            elif msg_type == "warning":
+                placeholder.warning(message)
+            elif msg_type == "info":
+                placeholder.info(message)
+            else:
+                placeholder.error(message)
+        else:
+            del st.session_state[notification_key]
+
+def publish_notification(result, success_text, failure_text):
+    if result.get("queued"):
+        return (f"{success_text} (broker offline, command queued)", "warning", time.time())
+    if result["success"] and not result.get("acked"):
+        return (f"{success_text} (no delivery confirmation yet)", "warning", time.time())
+    return (
+        success_text if result["success"] else failure_text,
+        "success" if result["success"] else "error",
+        time.time()
+    )
+
+def dispatch_notification(result, pending_text, success_text, failure_text):
+    """
+    Notification for a :class:`~nodes.dispatch.CommandDispatcher` submit.
+
+    A scheduled command has not been sent yet, so it is reported as
+    pending (``pending_text``), not as success; delivery is shown by the
+    page's delivery status once the broker acknowledges it.
+    """
+    if not result["success"]:
+        return (failure_text, "error", time.time())
+    if result["skipped"]:
+        return (f"{success_text} (already set on device)", "success", time.time())
+    return (pending_text, "info", time.time())
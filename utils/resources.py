@@ -0,0 +1,192 @@
+import logging
+import os
+import uuid
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# ***************** Constanta *******
+BROKER = st.secrets.get("BROKER")
+PORT =  st.secrets.get("BROKER_PORT")
+USERNAME =  st.secrets.get("BROKER_USERNAME")
+PASSWORD =  st.secrets.get("BROKER_PASSWORD")
+DEVICE_ID =  st.secrets.get("UBIDOTS_DEVICE_ID")
+TOKEN =  st.secrets.get("UBIDOTS_TOKEN")
+# Waktu tunggu konfirmasi (PUBACK) dari broker sebelum notifikasi ditampilkan
+ACK_WAIT = 2.0
+FIELD_ID = st.secrets.get("FIELD_ID", "sawah1")
+DATA_DIR = st.secrets.get("DATA_DIR", "data")
+# Daftar IP kamera, dipisah koma; dipakai untuk analisis semua kamera
+CAMERA_IPS = st.secrets.get("CAMERA_IPS", "")
+ANALYSIS_INTERVAL = st.secrets.get("ANALYSIS_INTERVAL")
+
+# ***************** Shared Resources *******
+# Dibuat sekali per proses; modul berat baru di-import saat resource pertama kali dipakai
+
+# Satu koneksi MQTT bersama untuk seluruh sesi dalam satu proses server
+@st.cache_resource(show_spinner=False)
+def get_shared_mqtt_client():
+    from nodes.mqtt_client import MyMQTTClient
+    if not all([BROKER, PORT, USERNAME, PASSWORD]):
+        raise ValueError("Incomplete MQTT configuration")
+    client_id = f"dashboard-{uuid.uuid4()}"
+    logger.info("Initializing shared MQTT client with Client ID: %s", client_id)
+    client = MyMQTTClient(BROKER, int(PORT), USERNAME, PASSWORD, client_id=client_id)
+    spool, replayer = get_spool()
+    client.attach_spool(spool, replayer)
+    replayer.register_sink("mqtt", client.replay)
+    # Referensi seumur proses untuk jalur ingest telemetri/deteksi: koneksi tetap hidup
+    # (dan deteksi tetap tercatat) walau tidak ada satu pun dashboard yang terbuka
+    client.acquire()
+    client.subscribe_telemetry(get_telemetry_store())
+    return client
+
+# Penyimpanan deteksi burung (persisten, dengan rollup per jam/hari)
+@st.cache_resource(show_spinner=False)
+def get_detection_store():
+    from nodes.detection_store import DetectionStore
+    return DetectionStore(os.path.join(DATA_DIR, "detections"))
+
+# Buffer telemetri perangkat, dibagi oleh semua sesi
+@st.cache_resource(show_spinner=False)
+def get_telemetry_store():
+    from nodes.telemetry import TelemetryStore
+    store = TelemetryStore()
+    detections = get_detection_store()
+
+    # Berjalan di thread jaringan MQTT; record() hanya memasukkan event ke antrean penulis
+    def record_detection(kind, field, device, data, ts):
+        if kind != "detection":
+            return
+        count = data.get("count", data.get("bird", 1))
+        if count:
+            detections.record(f"{field}/{device}", ts=ts, count=int(count),
+                              confidence=float(data.get("confidence", "nan")))
+
+    store.add_listener(record_detection)
+    return store
+
+# Spool di disk untuk data yang gagal terkirim, diputar ulang saat koneksi kembali
+@st.cache_resource(show_spinner=False)
+def get_spool():
+    from nodes.spool import Spool, SpoolReplayer
+    os.makedirs(DATA_DIR, exist_ok=True)
+    spool = Spool(os.path.join(DATA_DIR, "spool.sqlite3"))
+    return spool, SpoolReplayer(spool)
+
+# Client Ubidots bersama; upload dikirim oleh thread latar belakang
+@st.cache_resource(show_spinner=False)
+def get_ubidots_client():
+    from nodes.ubidots_client import ubidots
+    client = ubidots(
+        token=TOKEN,
+        device_label=DEVICE_ID
+    )
+    spool, replayer = get_spool()
+    client.attach_spool(spool)
+    replayer.register_sink("ubidots", client.replay)
+    return client
+
+# Perintah setting speaker di-debounce dan dilewati bila perangkat sudah pada nilai itu
+@st.cache_resource(show_spinner=False)
+def get_command_dispatcher():
+    from nodes.dispatch import CommandDispatcher
+    return CommandDispatcher(
+        get_shared_mqtt_client(),
+        telemetry=get_telemetry_store(),
+        ubidots_client=get_ubidots_client(),
+        debounce=float(st.secrets.get("COMMAND_DEBOUNCE", 0.5)),
+    )
+
+# Cache hasil analisis vision, dibagi semua sesi dan disimpan di disk
+@st.cache_resource(show_spinner=False)
+def get_analysis_cache():
+    from nodes.analysis_cache import AnalysisCache
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return AnalysisCache(
+        os.path.join(DATA_DIR, "analysis_cache.json"),
+        ttl=int(st.secrets.get("ANALYSIS_CACHE_TTL", 6 * 3600)),
+        max_distance=int(st.secrets.get("ANALYSIS_CACHE_DISTANCE", 4)),
+    )
+
+# Satu analyzer (dan satu pool koneksi keep-alive ke API vision) untuk semua sesi
+@st.cache_resource(show_spinner=False)
+def get_analyzer():
+    from nodes.LLM_nodes import (RicePlantAnalyzer, API_BASE_URL, DEFAULT_CONNECT_TIMEOUT,
+                                 DEFAULT_READ_TIMEOUT, DEFAULT_MAX_SIDE, MAX_TOKENS)
+    return RicePlantAnalyzer(
+        cache=get_analysis_cache(),
+        base_url=st.secrets.get("XAI_BASE_URL", API_BASE_URL),
+        connect_timeout=float(st.secrets.get("VISION_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=float(st.secrets.get("VISION_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+        max_side=int(st.secrets.get("VISION_MAX_SIDE", DEFAULT_MAX_SIDE)),
+        max_tokens=int(st.secrets.get("VISION_MAX_TOKENS", MAX_TOKENS)),
+    )
+
+# Penjadwal yang sudah dibuat, untuk dibaca tanpa membangunnya (lihat peek_analysis_results)
+_analysis_scheduler = None
+
+# Penjadwal analisis multi-kamera; hasil dibaca UI dari result store
+@st.cache_resource(show_spinner=False)
+def get_analysis_scheduler():
+    from nodes.scheduler import AnalysisScheduler
+    scheduler = AnalysisScheduler(
+        get_analyzer(),
+        vision_concurrency=int(st.secrets.get("VISION_CONCURRENCY", 4)),
+        vision_rate=float(st.secrets.get("VISION_RATE", 1.0)),
+    )
+    if ANALYSIS_INTERVAL and CAMERA_IPS:
+        scheduler.start_periodic(parse_camera_ips(CAMERA_IPS), float(ANALYSIS_INTERVAL))
+    global _analysis_scheduler
+    _analysis_scheduler = scheduler
+    return scheduler
+
+def peek_analysis_results():
+    """
+    ``host -> AnalysisResult`` lookup of the scheduler, or ``None`` if it was never built.
+
+    Unlike :func:`get_analysis_scheduler` this never constructs the
+    scheduler, so read-only pages don't import the vision client, start
+    periodic sweeps or retry without an API key on every rerun.
+    """
+    scheduler = _analysis_scheduler
+    return scheduler.store.get if scheduler is not None else None
+
+# Hasil pemindaian kamera di-cache per subnet, dibagi semua sesi
+@st.cache_resource(show_spinner=False)
+def get_camera_discovery():
+    from nodes.discovery import CameraDiscovery
+    return CameraDiscovery(ttl=int(st.secrets.get("DISCOVERY_TTL", 300)))
+
+# Registry lahan -> speaker/kamera/sensor, dimuat sekali; device baru dari telemetri ikut terdaftar
+@st.cache_resource(show_spinner=False)
+def get_device_registry():
+    from nodes.devices import DeviceRegistry
+    registry = DeviceRegistry.load(
+        st.secrets.get("DEVICES_FILE", os.path.join(DATA_DIR, "devices.json")),
+        default_field=FIELD_ID,
+        camera_ips=parse_camera_ips(CAMERA_IPS),
+    )
+    telemetry = get_telemetry_store()
+    # Device yang sudah melapor sebelum registry dimuat
+    for key in list(telemetry.last_seen):
+        field, device = key.split("/", 1)
+        registry.observe("status", field, device, None, None)
+    telemetry.add_listener(registry.observe)
+    return registry
+
+# Server HTTP /metrics format Prometheus; None bila METRICS_PORT tidak diisi atau port terpakai
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    from nodes.metrics import serve_metrics
+    port = st.secrets.get("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return serve_metrics(int(port), host=st.secrets.get("METRICS_HOST", "127.0.0.1"))
+    except OSError as e:
+        logger.error("Cannot serve metrics on port %s: %s", port, e)
+        return None
+
+def parse_camera_ips(text):
+    return [ip.strip() for ip in text.replace("\n", ",").split(",") if ip.strip()]
@@ -0,0 +1,74 @@
+import importlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Akar proyek, agar subprocess profil import menemukan paket nodes/utils/views dan secrets yang sama
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_TIMEOUT = 60
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# nama halaman/tahap -> detik
+load_times = {}
+# modul -> hasil profile_imports, dihitung sekali per proses
+_profiles = {}
+
+
+@contextmanager
+def timed_stage(name):
+    """Record how long ``name`` took, e.g. the entry point's own imports on cold start."""
+    started = time.perf_counter()
+    yield
+    if name not in load_times:
+        load_times[name] = time.perf_counter() - started
+        logger.info("Startup stage %s took %.3fs", name, load_times[name])
+
+
+def load_page(module_name):
+    """
+    Import a page module on first use and record its cold import cost.
+
+    Page modules import their heavy dependencies at module level, so a page
+    that is never opened never pays for them. Only the wall time of this
+    one ``import_module`` call is measured; nothing process-wide is hooked.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with timed_stage(module_name):
+        module = importlib.import_module(module_name)
+    return module
+
+
+def profile_imports(module_name, limit=15):
+    """
+    Slowest imports of ``module_name`` as ``(module, inclusive_s, self_s)``, by self time.
+
+    Runs ``python -X importtime -c "import <module_name>"`` in a fresh
+    interpreter, so the numbers are a true cold import and are not mixed
+    with imports made by other sessions or threads of this server. The
+    result is cached for the life of the process.
+    """
+    rows = _profiles.get(module_name)
+    if rows is None:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=PROFILE_TIMEOUT,
+        )
+        if completed.returncode != 0:
+            logger.warning("Import profile of %s exited with %s", module_name, completed.returncode)
+        rows = []
+        for line in completed.stderr.splitlines():
+            match = _IMPORTTIME_LINE.match(line)
+            if match:
+                own_us, total_us, _, name = match.groups()
+                rows.append((name, int(total_us) / 1e6, int(own_us) / 1e6))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        _profiles[module_name] = rows
+    return rows[:limit]
@@ -0,0 +1,60 @@
+import time
+
+# Interval minimum antar update UI dan ukuran buffer yang memaksa flush lebih awal
+DEFAULT_MIN_INTERVAL = 0.25
+DEFAULT_MAX_BUFFER = 2048
+
+
+class StreamRenderer:
+    """
+    Renders a token stream into a Streamlit placeholder at a bounded rate.
+
+    Chunks are collected in a list and the placeholder is only updated
+    every ``min_interval`` seconds, or sooner once ``max_buffer`` characters
+    are waiting. Each flush sends the whole text, so the number of flushes,
+    not the number of tokens, sets the frontend traffic. Call
+    :meth:`close` (or use it as a context manager) for the final flush.
+    """
+    def __init__(self, placeholder, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_buffer=DEFAULT_MAX_BUFFER, unsafe_allow_html=True):
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.max_buffer = max_buffer
+        self.unsafe_allow_html = unsafe_allow_html
+        self._parts = []
+        self._pending = 0
+        self._last_flush = 0.0
+        self.flushes = 0
+
+    @property
+    def text(self):
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self._pending += len(chunk)
+        if (self._pending >= self.max_buffer
+                or time.monotonic() - self._last_flush >= self.min_interval):
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self.placeholder.markdown(self.text, unsafe_allow_html=self.unsafe_allow_html)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self.flushes += 1
+
+    def close(self):
+        self.flush()
+        return self.text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
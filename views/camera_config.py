@@ -0,0 +1,99 @@
+import time
+import pandas as pd
+import streamlit as st
+from nodes.camera import get_camera, apply_fleet, CameraError, FRAMESIZES
+from nodes.discovery import local_subnet
+from utils.display import display_dict_to_ui
+from utils.notifications import display_notification
+from utils.resources import get_camera_discovery
+
+# Rentang jaringan untuk Scan Camera; default /24 milik server
+CAMERA_SUBNET = st.secrets.get("CAMERA_SUBNET") or local_subnet() or "192.168.1.0/24"
+
+
+def select_discovered_camera():
+    st.session_state.camera_ip = st.session_state.discovered_camera
+
+def camera_targets():
+    if st.session_state.get("camera_apply_all"):
+        scan_result = get_camera_discovery().cached(st.session_state.camera_subnet)
+        if scan_result is not None:
+            return [c["ip"] for c in scan_result[1]]
+    return [st.session_state.camera_ip] if st.session_state.camera_ip else []
+
+def apply_camera_settings(settings, notification_key):
+    targets = camera_targets()
+    if not targets:
+        st.session_state[notification_key] = ("Masukkan alamat IP kamera.", "error", time.time())
+        return
+    results = apply_fleet(targets, settings)
+    failed = {host: r["message"] for host, r in results.items() if not r["success"]}
+    changed = sum(1 for r in results.values() if r["changed"])
+    if not failed:
+        message = f"{changed} of {len(results)} camera(s) updated, the rest already matched."
+        st.session_state[notification_key] = (message, "success", time.time())
+    else:
+        message = f"Failed on {len(failed)} of {len(results)} camera(s): " + "; ".join(
+            f"{host}: {error}" for host, error in list(failed.items())[:3])
+        st.session_state[notification_key] = (
+            message, "warning" if len(failed) < len(results) else "error", time.time())
+
+def set_camera_xclk():
+    apply_camera_settings({"xclk": int(st.session_state.xclk)}, "xclk_notification")
+
+def set_camera_resolution():
+    apply_camera_settings({"framesize": FRAMESIZES.index(st.session_state.resolution)},
+                          "resolution_notification")
+
+
+def render():
+    st.subheader("⚙️ Camera Configuration")
+    discovery = get_camera_discovery()
+    subnet = st.text_input("Subnet", value=CAMERA_SUBNET, key="camera_subnet")
+    scan_result = None
+    if st.button("Scan Camera", key="scan_camera_button"):
+        try:
+            with st.spinner(f"Scanning {subnet}..."):
+                scan_result = (time.time(), discovery.scan(subnet, refresh=True))
+            # Status dari hasil scan dipakai sebagai state awal untuk diff setting
+            for camera in scan_result[1]:
+                get_camera(camera["ip"]).remember_status(camera["status"])
+        except ValueError as e:
+            st.error(f"Subnet tidak valid: {e}")
+    else:
+        scan_result = discovery.cached(subnet)
+    if scan_result is not None:
+        scanned_at, cameras = scan_result
+        st.caption(f"{len(cameras)} kamera ditemukan, dipindai {int(time.time() - scanned_at)} detik lalu.")
+        if cameras:
+            st.dataframe(pd.DataFrame([{k: v for k, v in c.items() if k != "status"} for c in cameras]),
+                         hide_index=True, use_container_width=True)
+            st.selectbox("Detected Cameras", [c["ip"] for c in cameras], index=None,
+                         key="discovered_camera", on_change=select_discovered_camera)
+    st.text_input("Enter Camera IP Address", value="", key="camera_ip")
+    if scan_result is not None and scan_result[1]:
+        st.checkbox(f"Terapkan ke semua {len(scan_result[1])} kamera hasil scan", key="camera_apply_all")
+    tab1, tab2 = st.tabs(["Camera Config", "Camera Status"])
+    with tab1:
+        xclk_placeholder = st.empty()
+        display_notification(xclk_placeholder, "xclk_notification")
+        cols = st.columns(2)
+        with cols[0]:
+            st.number_input("Xclk", value=20, key="xclk", min_value=20, max_value=40, step=1)
+        st.button("Set", key="set_camera_xclk_button", on_click=set_camera_xclk)
+        resolution_placeholder = st.empty()
+        display_notification(resolution_placeholder, "resolution_notification")
+        cols = st.columns(2)
+        with cols[0]:
+            st.selectbox("Resolution", options=FRAMESIZES, index=12, key="resolution")
+        st.button("Set", key="set_camera_resolution_button", on_click=set_camera_resolution)
+    with tab2:
+        if st.button("Cek Config", key="check_config_button"):
+            if not st.session_state.camera_ip:
+                st.warning("Masukkan alamat IP kamera.")
+            else:
+                try:
+                    status = get_camera(st.session_state.camera_ip).status(max_age=0)
+                    display_dict_to_ui(status, title=f"Status {st.session_state.camera_ip}")
+                except CameraError as e:
+                    st.error(f"Gagal membaca status kamera: {e}")
@@ -0,0 +1,69 @@
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.charts import render_bar_chart
+from utils.display import display_dict_to_ui
+from utils.resources import get_detection_store, get_telemetry_store
+
+# Interval refresh otomatis panel status perangkat (detik)
+STATUS_REFRESH = float(st.secrets.get("STATUS_REFRESH", 5))
+
+
+# Status terakhir satu perangkat, diperbarui sendiri; grup key yang tidak berubah tidak dikirim ulang
+@st.fragment(run_every=STATUS_REFRESH)
+def device_status(device_key):
+    telemetry = get_telemetry_store()
+    status = telemetry.latest_status.get(device_key)
+    if status is None:
+        return
+    display_dict_to_ui(status, title=f"Status {device_key}", expandable=False, incremental=True)
+    st.caption(f"Laporan terakhir {int(time.time() - telemetry.last_seen[device_key])} detik lalu.")
+
+
+def render():
+    st.subheader("📊 Dashboard")
+
+    st.write("### Deteksi Burung")
+    detections = get_detection_store()
+    period = st.radio("Periode", ["Per Jam (24 jam)", "Per Hari (30 hari)"], horizontal=True,
+                      key="detection_period")
+    now = time.time()
+    if period.startswith("Per Jam"):
+        bucket_ts, counts = detections.hourly(now - 23 * 3600, now)
+        label = "Jam"
+    else:
+        bucket_ts, counts = detections.daily(now - 29 * 86400, now)
+        label = "Hari"
+    # Tampilkan waktu lokal server
+    df_bird = pd.DataFrame({label: pd.to_datetime(bucket_ts + detections.tz_offset, unit="s"),
+                            "Burung Terdeteksi": counts})
+    st.line_chart(df_bird.set_index(label))
+
+    st.write("### Telemetri Perangkat")
+    telemetry = get_telemetry_store()
+    metrics = telemetry.metrics()
+    if metrics:
+        metric = st.selectbox("Metric", metrics, key="telemetry_metric")
+        ts, values = telemetry.snapshot(metric, last=500)
+        st.line_chart(pd.DataFrame({metric: values}, index=pd.to_datetime(ts, unit="s")))
+    else:
+        st.info("Belum ada data telemetri dari perangkat.")
+    devices = sorted(telemetry.latest_status)
+    if devices:
+        device_status(st.selectbox("Perangkat", devices, key="status_device"))
+
+    st.write("### Distribusi Penyakit Tanaman Padi (Dummy Data)")
+    diseases = ["Blast", "Bacterial Leaf Blight", "Tungro", "Sheath Blight", "Healthy"]
+    # Data dummy berganti per hari; versi data = nomor hari, jadi grafik hanya digambar ulang sekali sehari
+    data_version = int(time.time() // 86400)
+    counts = np.random.default_rng(data_version).integers(10, 100, size=len(diseases))
+    chart = render_bar_chart(
+        ("disease_distribution", data_version),
+        diseases,
+        counts,
+        _colors=["red", "orange", "yellow", "green", "blue"],
+        title="Distribusi Penyakit Tanaman Padi",
+        ylabel="Jumlah Kasus",
+    )
+    st.image(chart)
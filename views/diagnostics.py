@@ -0,0 +1,71 @@
+import pandas as pd
+import streamlit as st
+from nodes.logging_setup import dropped_records
+from nodes.metrics import Counter, Gauge, registry
+from utils.resources import get_metrics_server
+
+
+def metrics_table():
+    rows = []
+    for name, labels, metric in registry.collect():
+        row = {"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in sorted(labels.items()))}
+        if isinstance(metric, (Counter, Gauge)):
+            row["value"] = metric.value
+        else:
+            snapshot = metric.snapshot()
+            row["value"] = snapshot["count"]
+            row.update({q: snapshot[q] for q in ("p50", "p95", "p99")})
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["metric", "labels", "value", "p50", "p95", "p99"]) \
+        .sort_values(["metric", "labels"])
+
+def page_timings():
+    # Satu baris per halaman: render saja vs rerun penuh (termasuk sidebar dan init sesi);
+    # halaman streaming hanya punya durasi sesi (page_session_seconds)
+    reruns = {labels["page"]: counter.value for _, labels, counter in registry.collect("app_reruns_total")}
+    timings = {metric: {labels["page"]: hist.snapshot() for _, labels, hist in registry.collect(metric)}
+               for metric in ("page_render_seconds", "app_rerun_seconds", "page_session_seconds")}
+    rows = []
+    for page in sorted(reruns):
+        row = {"page": page, "reruns": reruns[page]}
+        for metric, label in (("page_render_seconds", "render"), ("app_rerun_seconds", "rerun"),
+                              ("page_session_seconds", "session")):
+            snapshot = timings[metric].get(page, {})
+            row[f"{label} p50 (ms)"] = _ms(snapshot.get("p50"))
+            row[f"{label} p95 (ms)"] = _ms(snapshot.get("p95"))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def render():
+    st.subheader("🩺 Diagnostics")
+    server = get_metrics_server()
+    if server is not None:
+        host, port = server.server_address[:2]
+        st.caption(f"Prometheus endpoint: http://{host}:{port}/metrics")
+    else:
+        st.caption("Endpoint /metrics nonaktif; isi METRICS_PORT di secrets untuk mengaktifkan.")
+
+    cols = st.columns(3)
+    cols[0].metric("Render berjalan", registry.gauge("page_renders_inflight").value)
+    mqtt_client = st.session_state.get("mqtt_client")
+    if mqtt_client:
+        link = mqtt_client.connection_info()
+        cols[1].metric("MQTT", link["state"], f"{link['pending']} pending", delta_color="off")
+    cols[2].metric("Log records dropped", dropped_records())
+
+    st.write("### Waktu per Halaman")
+    timings = page_timings()
+    if timings.empty:
+        st.info("Belum ada rerun yang tercatat.")
+    else:
+        st.dataframe(timings, hide_index=True, use_container_width=True)
+
+    st.write("### Semua Metrik")
+    st.dataframe(metrics_table(), hide_index=True, use_container_width=True)
+    with st.expander("Format Prometheus"):
+        st.code(registry.exposition(), language="text")
+    st.button("Refresh", key="refresh_diagnostics_button")
@@ -0,0 +1,80 @@
+import math
+import pandas as pd
+import streamlit as st
+from nodes.camera import peek_status
+from nodes.devices import KINDS, STATES, fleet_snapshot
+from utils.resources import get_device_registry, get_telemetry_store, peek_analysis_results
+
+# Interval refresh otomatis tabel armada (detik)
+FLEET_REFRESH = float(st.secrets.get("FLEET_REFRESH", 5))
+PAGE_SIZES = (50, 100, 250, 500)
+STATE_ICONS = {"online": "🟢", "stale": "🟡", "offline": "🔴", "unknown": "⚪"}
+
+
+def reset_page():
+    st.session_state.fleet_page = 1
+
+def fleet_filters(registry):
+    cols = st.columns([2, 2, 2, 3])
+    fields = cols[0].multiselect("Lahan", registry.fields(), key="fleet_fields", on_change=reset_page)
+    kinds = cols[1].multiselect("Jenis", KINDS, key="fleet_kinds", on_change=reset_page)
+    states = cols[2].multiselect("Status", STATES, key="fleet_states", on_change=reset_page)
+    search = cols[3].text_input("Cari device", key="fleet_search", on_change=reset_page)
+    return fields, kinds, states, search.strip().lower()
+
+def filter_rows(rows, fields, kinds, states, search):
+    return [row for row in rows
+            if (not fields or row["field"] in fields)
+            and (not kinds or row["kind"] in kinds)
+            and (not states or row["state"] in states)
+            and (not search or search in row["device"].lower())]
+
+def show_summary(rows):
+    counts = dict.fromkeys(STATES, 0)
+    for row in rows:
+        counts[row["state"]] += 1
+    cols = st.columns(len(STATES) + 1)
+    cols[0].metric("Device", len(rows))
+    for col, state in zip(cols[1:], STATES):
+        col.metric(f"{STATE_ICONS[state]} {state.capitalize()}", counts[state])
+
+def show_page(rows):
+    # Hanya satu halaman yang dikirim ke browser; st.dataframe sendiri sudah virtualized
+    page_size = st.session_state.get("fleet_page_size", PAGE_SIZES[0])
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page = min(st.session_state.get("fleet_page", 1), pages)
+    start = (page - 1) * page_size
+    table = pd.DataFrame(rows[start:start + page_size],
+                         columns=["field", "kind", "device", "state", "last_seen", "detail"])
+    table["state"] = table["state"].map(lambda s: f"{STATE_ICONS[s]} {s}")
+    table["last_seen"] = pd.to_datetime(table["last_seen"], unit="s")
+    st.dataframe(table, hide_index=True, use_container_width=True,
+                 column_config={"last_seen": st.column_config.DatetimeColumn(
+                     "last seen", format="YYYY-MM-DD HH:mm:ss")})
+    st.caption(f"Menampilkan {start + 1 if rows else 0}–{start + len(table)} dari {len(rows)} device")
+
+@st.fragment(run_every=FLEET_REFRESH)
+def live_fleet(filters):
+    # Fragment dijalankan ulang sendiri; snapshot dibaca dari memori, tanpa request ke perangkat
+    rows = fleet_snapshot(get_device_registry(), get_telemetry_store(), peek_status, peek_analysis_results())
+    rows = filter_rows(rows, *filters)
+    rows.sort(key=lambda row: (STATES.index(row["state"]), row["field"], row["device"]))
+    show_summary(rows)
+    show_page(rows)
+
+
+def render():
+    st.subheader("🛰️ Fleet Overview")
+    registry = get_device_registry()
+    if not len(registry):
+        st.info("Belum ada device terdaftar. Isi DEVICES_FILE atau tunggu telemetri dari perangkat.")
+        return
+    filters = fleet_filters(registry)
+    cols = st.columns([1, 1, 4])
+    cols[0].selectbox("Baris per halaman", PAGE_SIZES, key="fleet_page_size", on_change=reset_page)
+    cols[1].number_input("Halaman", min_value=1, step=1, key="fleet_page")
+    live_fleet(filters)
+
+    with st.expander("Device per lahan"):
+        st.dataframe(pd.DataFrame.from_dict(registry.counts(), orient="index"),
+                     use_container_width=True)
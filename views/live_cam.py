@@ -0,0 +1,50 @@
+import streamlit as st
+from nodes.mjpeg import StreamLease, get_stream
+
+# Batas frame per detik yang dikirim ke browser per penonton Live Cam
+LIVE_CAM_FPS = float(st.secrets.get("LIVE_CAM_FPS", 5))
+CAMERA_STREAM_PORT = int(st.secrets.get("CAMERA_STREAM_PORT", 81))
+
+
+def stop_stream():
+    lease = st.session_state.pop("live_cam_lease", None)
+    if lease is not None:
+        lease.release()
+
+# Tiap tick adalah run fragment yang selesai, jadi frame lama dibuang Streamlit (bukan menumpuk)
+@st.fragment(run_every=1.0 / LIVE_CAM_FPS)
+def live_frame(camera_ip):
+    reader = st.session_state.live_cam_lease.reader
+    _, frame, _ = reader.latest()
+    if frame is not None:
+        # Hanya frame terbaru yang dikirim; frame di antaranya dilewati
+        st.image(frame, caption=f"{camera_ip} · {reader.viewers} viewer(s)")
+    elif reader.error:
+        st.warning(f"Menghubungkan ulang ke kamera: {reader.error}")
+    else:
+        st.info("Menunggu frame pertama dari kamera...")
+
+
+def render():
+    st.subheader("📺 Live Cam")
+    live_camera_ip = st.text_input("Enter Camera IP Address", value="", key="live_cam_ip")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Start Camera", key="start_camera_button"):
+            st.session_state.live_cam_running = bool(live_camera_ip)
+            if not live_camera_ip:
+                st.warning("Masukkan alamat IP kamera.")
+    with col2:
+        if st.button("Stop Camera", key="stop_camera_button"):
+            st.session_state.live_cam_running = False
+    if st.session_state.get("live_cam_running") and live_camera_ip:
+        # Satu stream per kamera untuk semua sesi; sesi ini dihitung penonton selama lease dipegang
+        reader = get_stream(live_camera_ip, CAMERA_STREAM_PORT)
+        lease = st.session_state.get("live_cam_lease")
+        if lease is None or lease.reader is not reader:
+            stop_stream()
+            st.session_state.live_cam_lease = StreamLease(reader)
+        live_frame(live_camera_ip)
+    else:
+        stop_stream()
+        st.write("Camera feed stopped.")
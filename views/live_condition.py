@@ -0,0 +1,92 @@
+import logging
+import pandas as pd
+import streamlit as st
+from nodes.camera import get_camera, CameraError
+from nodes.LLM_nodes import StreamStats
+from utils.resources import CAMERA_IPS, get_analyzer, get_analysis_scheduler, parse_camera_ips
+from utils.streaming import StreamRenderer
+
+logger = logging.getLogger(__name__)
+
+# Jeda minimum antar update teks analisis yang sedang di-stream (detik)
+STREAM_RENDER_INTERVAL = float(st.secrets.get("STREAM_RENDER_INTERVAL", 0.25))
+
+
+def stream_caption(stats):
+    if stats.cached:
+        return "Hasil dari cache analisis."
+    parts = []
+    if stats.ttft is not None:
+        parts.append(f"token pertama {stats.ttft:.2f}s")
+    if stats.tokens_per_second is not None:
+        parts.append(f"{stats.tokens_per_second:.0f} token/s")
+    if stats.latency is not None:
+        parts.append(f"total {stats.latency:.2f}s")
+    parts.append(f"upload {stats.bytes_uploaded / 1024:.0f} KB")
+    return " · ".join(parts)
+
+
+def render():
+    st.subheader("🌾 Live Condition")
+    camera_ip = st.text_input("Enter Camera IP Address", value="", key="live_condition_camera_ip")
+    
+    if st.button("Capture and Analyze", key="capture_analyze_button"):
+        # Frame klik sebelumnya bisa dari kamera lain; hanya hasil capture klik ini yang dianalisis
+        st.session_state.pop("captured_frame", None)
+        if not camera_ip:
+            st.warning("Masukkan alamat IP kamera.")
+        else:
+            try:
+                st.session_state.captured_frame = get_camera(camera_ip).fetch_jpeg()
+            except CameraError as e:
+                st.error(f"Gagal mengambil gambar dari kamera: {e}")
+
+        if st.session_state.get("captured_frame"):
+            col1, col2 = st.columns([1, 2])
+            st.image(st.session_state.captured_frame, caption="Captured Frame")
+            st.write("### Analysis")
+            # Create a placeholder for streaming analysis
+            analysis_container = st.empty()
+            try:
+                analyzer = get_analyzer()
+                stats = StreamStats()
+
+                # Stream analysis output with a spinner
+                # Update UI dibatasi beberapa kali per detik, bukan per token
+                with st.spinner("Analyzing rice plant condition..."), \
+                        StreamRenderer(analysis_container,
+                                       min_interval=STREAM_RENDER_INTERVAL) as renderer:
+                    for chunk in analyzer.infer_plant_condition(
+                            camera_ip=camera_ip, image=st.session_state.captured_frame,
+                            stats=stats):
+                        renderer.write(chunk)
+                logger.debug("Rendered analysis in %d UI updates.", renderer.flushes)
+                st.caption(stream_caption(stats))
+            except Exception as e:
+                analysis_container.error(f"Error during analysis: {str(e)}")
+                logger.error("Analysis failed: %s", e)
+    else:
+        st.info("Klik 'Capture and Analyze' untuk mengambil gambar dan menganalisis kondisi tanaman.")
+
+    st.write("### Semua Kamera")
+    cameras_text = st.text_area("Camera IP Addresses (pisahkan dengan koma)", value=CAMERA_IPS,
+                                key="analysis_camera_ips")
+    try:
+        scheduler = get_analysis_scheduler()
+    except Exception as e:
+        scheduler = None
+        st.error(f"Penjadwal analisis tidak tersedia: {e}")
+    if scheduler is not None:
+        if st.button("Analyze All Cameras", key="analyze_all_button"):
+            queued = scheduler.sweep(parse_camera_ips(cameras_text))
+            st.toast(f"{len(queued)} kamera masuk antrian analisis.")
+        results = scheduler.store.all()
+        if results:
+            st.dataframe(pd.DataFrame([r.as_dict() for r in results]), hide_index=True,
+                         use_container_width=True)
+            for result in results:
+                if result.text:
+                    with st.expander(f"{result.camera_ip} ({result.status})"):
+                        st.markdown(result.text, unsafe_allow_html=True)
+            if st.button("Refresh", key="refresh_analysis_button"):
+                st.rerun()
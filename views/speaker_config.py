@@ -0,0 +1,155 @@
+import time
+import streamlit as st
+from utils.notifications import display_notification, publish_notification, dispatch_notification
+from nodes.devices import SPEAKER
+from utils.resources import ACK_WAIT, FIELD_ID, get_command_dispatcher, get_device_registry
+
+
+def speaker_field():
+    """Lahan yang speakernya sedang diatur; default FIELD_ID."""
+    return st.session_state.get("speaker_field") or FIELD_ID
+
+# Status pengiriman diperbarui sendiri tiap detik, tanpa menunggu rerun halaman
+@st.fragment(run_every=1.0)
+def delivery_caption(command_name):
+    if not st.session_state.mqtt_client:
+        return
+    result = get_command_dispatcher().last_result(command_name, speaker_field())
+    if result is None:
+        return
+    handle = result.get("handle")
+    if not result["success"] or (handle is not None and handle.error is not None):
+        state = ":red[failed]"
+    elif handle is not None and handle.spooled:
+        state = ":orange[spooled to disk, sent on reconnect]"
+    elif result["queued"]:
+        state = ":orange[queued (broker offline)]"
+    else:
+        state = ":green[delivered]" if handle is not None and handle.acked else "awaiting confirmation"
+    st.caption(f"Last command: {state}")
+
+def play_test_sound():
+    if st.session_state.mqtt_client:
+        result = st.session_state.mqtt_client.send_command("play_test_sound", speaker_field(), wait=ACK_WAIT)
+        st.session_state.play_notification = publish_notification(
+            result,
+            "Playing test sound.",
+            "Failed to play test sound."
+        )
+    else:
+        st.session_state.play_notification = (
+            "MQTT client not initialized.",
+            "error",
+            time.time()
+        )
+
+def stop_test_sound():
+    if st.session_state.mqtt_client:
+        result = st.session_state.mqtt_client.send_command("stop_sound", speaker_field(), wait=ACK_WAIT)
+        st.session_state.stop_notification = publish_notification(
+            result,
+            "Stopping test sound.",
+            "Failed to stop test sound."
+        )
+    else:
+        st.session_state.stop_notification = (
+            "MQTT client not initialized.",
+            "error",
+            time.time()
+        )
+
+def set_volume():
+    if st.session_state.mqtt_client:
+        volume = st.session_state.volume_slider
+        result = get_command_dispatcher().submit(
+            "set_volume", speaker_field(), mirror={"speaker_volume": volume}, value=volume)
+        st.session_state.volume_notification = dispatch_notification(
+            result,
+            f"Volume {volume} scheduled, sending shortly.",
+            f"Volume set to {volume}.",
+            "Failed to set volume."
+        )
+    else:
+        st.session_state.volume_notification = (
+            "MQTT client not initialized.",
+            "error",
+            time.time()
+        )
+
+def set_sound_file():
+    if st.session_state.mqtt_client:
+        sound_file = st.session_state.sound_file_number
+        result = get_command_dispatcher().submit(
+            "set_default_sound", speaker_field(), mirror={"current_audio": sound_file}, filenumber=sound_file)
+        st.session_state.set_sound_notification = dispatch_notification(
+            result,
+            f"Sound file {sound_file} scheduled, sending shortly.",
+            f"Sound file set to {sound_file}.",
+            "Failed to set sound file."
+        )
+    else:
+        st.session_state.set_sound_notification = (
+            "MQTT client not initialized.",
+            "error",
+            time.time()
+        )
+
+def play_sound_file():
+    if st.session_state.mqtt_client:
+        sound_file = st.session_state.play_sound_file_number
+        result = st.session_state.mqtt_client.send_command(
+            "play_sound_file", speaker_field(), wait=ACK_WAIT, filenumber=sound_file)
+        st.session_state.play_file_notification = publish_notification(
+            result,
+            f"Playing sound file {sound_file}.",
+            "Failed to play sound file."
+        )
+    else:
+        st.session_state.play_file_notification = (
+            "MQTT client not initialized.",
+            "error",
+            time.time()
+        )
+
+
+
+def render():
+    st.subheader("🔊 Speaker Configuration")
+    fields = get_device_registry().fields(SPEAKER)
+    if len(fields) > 1:
+        st.selectbox("Lahan", fields, index=fields.index(FIELD_ID) if FIELD_ID in fields else 0,
+                     key="speaker_field")
+    
+    # Speaker Test
+    st.write("## Speaker Test")
+    play_placeholder = st.empty()
+    display_notification(play_placeholder, "play_notification")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("Play test", key="play_speaker_button", on_click=play_test_sound)
+    with col2:
+        display_notification(play_placeholder, "stop_notification")
+        st.button("Stop test", key="stop_speaker_button", on_click=stop_test_sound)
+    
+    # Speaker Config
+    st.write("## Speaker Config")
+    volume_placeholder = st.empty()
+    display_notification(volume_placeholder, "volume_notification")
+    st.slider("Volume", 0, 30, 30, key="volume_slider")
+    st.button("Set Volume", key="set_volume_button", on_click=set_volume)
+    delivery_caption("set_volume")
+    
+    # Choose Sound File
+    st.write("## Choose Sound File")
+    set_sound_placeholder = st.empty()
+    display_notification(set_sound_placeholder, "set_sound_notification")
+    st.number_input("Sound File", 0, 100, 1, key="sound_file_number")
+    st.button("Set Sound File", key="set_sound_file_button", on_click=set_sound_file)
+    delivery_caption("set_default_sound")
+    
+    # Play Sound File
+    st.write("## Play Sound File")
+    play_file_placeholder = st.empty()
+    display_notification(play_file_placeholder, "play_file_notification")
+    st.number_input("Sound File Number", 0, 100, 1, key="play_sound_file_number")
+    st.button("Play Sound File", key="play_sound_file_button", on_click=play_sound_file)